@@ -10,13 +10,54 @@ Para ejecutar: python PY_NASCAR_EMAYLEO_pixel.py
 import pygame
 import random
 import sys
+import bisect
 import math
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+# NumPy es opcional: acelera el almacén de entidades si está instalado
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# El renderizador de texturas (NASCAR_RENDER=texturas) usa el módulo SDL2 de pygame 2
+try:
+    from pygame._sdl2 import video as sdl2_video
+except ImportError:
+    sdl2_video = None
+
+# Tiempos de arranque por fase (NASCAR_ARRANQUE=1 los imprime al cargar todo)
+_startup_start = _startup_last = time.perf_counter()
+startup_times = {}
+
+
+def startup_mark(phase, began=None):
+    """Anota cuándo terminó una fase (ms desde el arranque) y cuánto duró.
+    Las tareas de fondo pasan su propio 'began'."""
+    global _startup_last
+    now = time.perf_counter()
+    if began is None:
+        began, _startup_last = _startup_last, now
+    startup_times[phase] = ((now - _startup_start) * 1000.0, (now - began) * 1000.0)
+
 
 pygame.init()
+startup_mark("pygame.init")
 WIDTH, HEIGHT = 900, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
+# con el renderizador de texturas la ventana visible es la del Renderer; la de
+# set_mode queda oculta y sigue siendo la superficie de dibujo (y el formato de convert())
+_want_textures = os.environ.get("NASCAR_RENDER") == "texturas" and sdl2_video is not None
+screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HIDDEN if _want_textures else 0)
 pygame.display.set_caption("NASCAR Pixel FX - Circuito")
 clock = pygame.time.Clock()
+startup_mark("ventana")
 
 # -----------------------------
 # COLORES Y CONSTANTES PIXEL
@@ -45,13 +86,65 @@ LANE_OFFSETS = [40, 160, 280, 400]
 # Dimensiones jugador/obstáculo (en pixeles reales)
 CAR_W, CAR_H = 60, 100
 
-# Fuentes
-title_font = pygame.font.SysFont("Arial", 48, bold=True)
-menu_font = pygame.font.SysFont("Arial", 26)
-hud_font = pygame.font.SysFont("Arial", 18)
-small_font = pygame.font.SysFont("Arial", 16)
+# -----------------------------
+# FUENTES Y SONIDOS (CARGA EN SEGUNDO PLANO)
+# -----------------------------
+# Buscar "Arial" con SysFont recorre todo el catálogo de fuentes del sistema,
+# y eso puede tardar segundos. Se arranca con la fuente que trae pygame (al
+# instante) y un hilo hace la búsqueda; el hilo principal cambia a las
+# fuentes definitivas con apply_loaded_assets() en cuanto están listas.
+# Si junto al juego hay una carpeta "fuentes" con FONT_FILES, se usan esas
+# sin consultar el sistema.
+
+FONT_FAMILY = "Arial"
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fuentes")
+FONT_FILES = {False: "regular.ttf", True: "bold.ttf"}
+# nombre de la variable global -> (tamaño, negrita)
+FONT_SPECS = {
+    "title_font": (48, True),
+    "menu_font": (26, False),
+    "hud_font": (18, False),
+    "small_font": (16, False),
+}
+
+
+def make_font(size, bold=False, path=None):
+    font = pygame.font.Font(path, size)
+    font.set_bold(bold)
+    return font
+
+
+# Fuentes provisionales: la incluida en pygame, sin buscar nada en el sistema
+title_font = make_font(48, bold=True)
+menu_font = make_font(26)
+hud_font = make_font(18)
+small_font = make_font(16)
+startup_mark("fuentes incluidas")
+
+fonts_source = "incluidas"
+_startup_reported = False
+_fonts_found = None    # lo deja el hilo de fuentes: "carpeta", "sistema" o None
+ASSETS_READY = pygame.event.custom_type()
+
+
+def _discover_fonts():
+    global _fonts_found
+    began = time.perf_counter()
+    if all(os.path.exists(os.path.join(FONT_DIR, f)) for f in FONT_FILES.values()):
+        _fonts_found = "carpeta"
+    else:
+        # match_font llena el catálogo de pygame: después SysFont es inmediato
+        pygame.font.match_font(FONT_FAMILY)
+        _fonts_found = "sistema"
+    startup_mark("fuentes del sistema (fondo)", began)
+    try:
+        # despierta a las pantallas fijas, que duermen en pygame.event.wait()
+        pygame.event.post(pygame.event.Event(ASSETS_READY))
+    except pygame.error:
+        pass  # pygame ya se cerró
+
 
-# Efectos de sonido (opcionales)
+# Efectos de sonido (opcionales): quedan en None hasta que el hilo los carga
 def load_sound(name):
     try:
         s = pygame.mixer.Sound(name)
@@ -60,9 +153,65 @@ def load_sound(name):
     except Exception:
         return None
 
-turbo_sound = load_sound("turbo.wav")
-cheer_sound = load_sound("cheer.wav")
-pop_sound = load_sound("pop.wav")
+turbo_sound = None
+cheer_sound = None
+pop_sound = None
+# race_step corre también sin ventana (repeticiones, resimulate, el simulador):
+# sus efectos solo suenan mientras main_loop muestra la carrera
+race_sounds_enabled = False
+
+
+def _load_sounds():
+    global turbo_sound, cheer_sound, pop_sound
+    began = time.perf_counter()
+    turbo_sound = load_sound("turbo.wav")
+    cheer_sound = load_sound("cheer.wav")
+    pop_sound = load_sound("pop.wav")
+    startup_mark("sonidos (fondo)", began)
+
+
+def apply_loaded_assets():
+    """Desde el hilo principal: cambia a las fuentes definitivas si el hilo de
+    fondo ya las encontró. Devuelve True si hay que volver a dibujar el texto."""
+    global fonts_source
+    if _fonts_found is None or fonts_source != "incluidas":
+        return False
+    began = time.perf_counter()
+    for name, (size, bold) in FONT_SPECS.items():
+        if _fonts_found == "carpeta":
+            font = make_font(size, bold, os.path.join(FONT_DIR, FONT_FILES[bold]))
+        else:
+            font = pygame.font.SysFont(FONT_FAMILY, size, bold=bold)
+        globals()[name] = font
+    fonts_source = _fonts_found
+    clear_text_cache()
+    startup_mark("cambio de fuentes", began)
+    report_startup()
+    return True
+
+
+def report_startup():
+    """Imprime el desglose una sola vez, cuando ya se vio el menú y se
+    cambiaron las fuentes (solo con NASCAR_ARRANQUE=1)."""
+    global _startup_reported
+    if _startup_reported or not os.environ.get("NASCAR_ARRANQUE"):
+        return
+    if "primer cuadro del menú" in startup_times and "cambio de fuentes" in startup_times:
+        _startup_reported = True
+        print(startup_report())
+
+
+def startup_report():
+    lines = ["Arranque (ms desde el inicio / duración):"]
+    for phase, (at, took) in sorted(startup_times.items(), key=lambda item: item[1][0]):
+        lines.append(f"  {phase:30s} {at:8.1f} {took:8.1f}")
+    return "\n".join(lines)
+
+
+_asset_threads = [threading.Thread(target=_load_sounds, name="sonidos", daemon=True),
+                  threading.Thread(target=_discover_fonts, name="fuentes", daemon=True)]
+for _thread in _asset_threads:
+    _thread.start()
 
 # -----------------------------
 # VARIABLES GLOBALES (iniciales)
@@ -73,12 +222,6 @@ player_speed = 7
 boost_speed = 13
 is_boosting = False
 
-obstacles = []
-trees = []
-lamps = []
-
-SPAWN_OBSTACLE_EVENT = pygame.USEREVENT + 1
-
 # meta / bandera
 finish_line_y = -10000
 finish_visible = False
@@ -86,6 +229,7 @@ finish_traveled = False
 
 celebrating = False
 celebration_start = 0
+CELEBRATION_MS = 3500
 
 player_progress = 0.0
 rival_progress = 0.0
@@ -99,6 +243,7 @@ praise_timer = 0
 praise_text = ""
 
 track_distance = 0.0
+road_scroll = 0.0
 lap_count = 0
 laps_total = 3
 lap_distance = 2000.0
@@ -106,76 +251,943 @@ lap_distance = 2000.0
 curve_amplitude = 160
 curve_wavelength = 800.0
 
-# Spawning visual density controls (reducción de amontonamiento)
+# Densidad del paisaje (reducción de amontonamiento)
 TREE_MIN_SPACING = 120  # píxeles mínimos entre árboles
 LAMP_MIN_SPACING = 220  # píxeles mínimos entre faroles
-INITIAL_TREE_COUNT = 6
-INITIAL_LAMP_COUNT = 5
+SCENERY_CROSS_SPACING = 48  # entre un árbol y un farol
+TREES_PER_CHUNK = 6     # por tramo de SCENERY_CHUNK píxeles de carretera
+LAMPS_PER_CHUNK = 3
+
+# Simulación a paso fijo: la lógica avanza siempre SIM_HZ veces por segundo,
+# sin importar cuántos cuadros se dibujen.
+SIM_HZ = 60
+SIM_DT_MS = 1000.0 / SIM_HZ
+MAX_SIM_STEPS_PER_FRAME = 5
+obstacle_speed = 0.0
+prev_player_x = player_x
+wheel_offset = 0
+
+# Estadísticas de ritmo de cuadros (NASCAR_FRAME_STATS=1 las imprime al terminar)
+FRAME_BUDGET_MS = 1000.0 / 60
+FRAME_DEADLINE_SLACK_MS = 1.0
+FRAME_STATS_WINDOW = 3600
+frame_times = deque(maxlen=FRAME_STATS_WINDOW)
+sim_steps_per_frame = {}
+missed_deadlines = 0
+
+# -----------------------------
+# ALEATORIEDAD DE LA CARRERA
+# -----------------------------
+# Todo lo que decide el resultado de una carrera (obstáculos, paisaje, rivales
+# y elogios) sale de flujos con semilla propia; lo puramente visual (confeti,
+# llamas del turbo) sigue usando el módulo random global.
+
+class RngStream(random.Random):
+    """Generador splitmix64: todo su estado es un entero de 64 bits, así que
+    se puede guardar y restaurar sin copiar la tabla de Mersenne Twister."""
+
+    MASK = (1 << 64) - 1
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = random.getrandbits(64)
+        self.state = int(a) & self.MASK
+        self.gauss_next = None
+
+    def _next64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & self.MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & self.MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & self.MASK
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self._next64() >> 11) * (1.0 / 9007199254740992.0)
+
+    def getrandbits(self, k):
+        if k <= 64:
+            return self._next64() >> (64 - k)
+        bits = 0
+        for shift in range(0, k, 64):
+            bits |= self._next64() << shift
+        return bits & ((1 << k) - 1)
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+
+rng_obstacles = RngStream(0)
+# el paisaje ya no sale de este flujo sino de la posición en la pista; se sigue
+# sembrando para no cambiar las semillas de los demás (ni las grabaciones)
+rng_scenery = RngStream(0)
+rng_praise = RngStream(0)
+# va al final para que las semillas de los flujos anteriores no cambien
+rng_rivals = RngStream(0)
+RACE_STREAMS = (rng_obstacles, rng_scenery, rng_praise, rng_rivals)
+
+race_seed = 0
+race_tick = 0          # pasos de simulación desde la salida
+race_time_ms = 0.0     # tiempo simulado (no de reloj) de la carrera
+spawn_interval_ticks = 1
+
+
+def seed_race(seed):
+    """Siembra todos los flujos de la carrera a partir de una sola semilla."""
+    global race_seed
+    race_seed = seed
+    base = RngStream(seed)
+    for stream in RACE_STREAMS:
+        stream.seed(base.getrandbits(64))
 
 # -----------------------------
 # UTILIDADES PIXEL ART
 # -----------------------------
 
-def pixel_rect(surf, x, y, w, h, color):
-    """Dibuja un rectángulo con 'bloques' de tamaño PIXEL: aspecto pixelado."""
+def pixel_rect_blocks(surf, x, y, w, h, color):
+    """Versión de referencia: un pygame.draw.rect por cada bloque PIXEL×PIXEL.
+    Se conserva solo para comparar contra el rasterizador por lotes."""
     for ix in range(0, w, PIXEL):
         for iy in range(0, h, PIXEL):
             pygame.draw.rect(surf, color, (x + ix, y + iy, PIXEL, PIXEL))
 
 
-def place_non_overlapping(x_range, existing, min_spacing, attempts=30):
-    """Devuelve una x válida que no esté demasiado cerca de 'existing'.
-    Si no encuentra en 'attempts', devuelve una posición cualquiera dentro de x_range."""
-    for _ in range(attempts):
-        x = random.randint(x_range[0], x_range[1])
-        ok = True
-        for e in existing:
-            if abs(x - e.centerx) < min_spacing:
-                ok = False
-                break
-        if ok:
-            return x
-    return random.randint(x_range[0], x_range[1])
+def pixel_rect(surf, x, y, w, h, color):
+    """Dibuja un rectángulo con 'bloques' de tamaño PIXEL: aspecto pixelado.
+    Los bloques cubren w y h redondeados hacia arriba a múltiplos de PIXEL, así que
+    la unión de todos ellos es un único rectángulo: basta con un solo fill.
+    Las coordenadas son de pantalla; en el framebuffer de baja resolución cada
+    bloque es un píxel."""
+    if w <= 0 or h <= 0:
+        return
+    s = art_scale
+    bw = -(-w // PIXEL) * PIXEL
+    bh = -(-h // PIXEL) * PIXEL
+    if s == 1:
+        surf.fill(color, (x, y, bw, bh))
+    else:
+        surf.fill(color, (x // s, y // s, bw // s, bh // s))
+
+
+def pixel_rects(surf, rects, color):
+    """Rasteriza varios rectángulos pixelados del mismo color en un solo lote."""
+    fill = surf.fill
+    s = art_scale
+    for x, y, w, h in rects:
+        if w > 0 and h > 0:
+            fill(color, (x // s, y // s, -(-w // PIXEL) * PIXEL // s, -(-h // PIXEL) * PIXEL // s))
+
+# -----------------------------
+# FRAMEBUFFER DE BAJA RESOLUCIÓN
+# -----------------------------
+# Modo opcional (NASCAR_BAJA_RES=1 o F6 en carrera): la escena se dibuja en un
+# framebuffer de WIDTH/PIXEL × HEIGHT/PIXEL donde cada bloque PIXEL×PIXEL es un
+# píxel, y se amplía una sola vez por cuadro con pygame.transform.scale. Los
+# draw_* siguen recibiendo coordenadas de pantalla y dibujan en 'canvas'; las
+# funciones art_* las pasan al lienzo. El texto (HUD, carteles) se dibuja
+# después de ampliar, a resolución completa. Las máscaras de colisión salen
+# siempre de los sprites a resolución completa: la física no depende del modo.
+
+lowres_enabled = bool(os.environ.get("NASCAR_BAJA_RES"))
+art_scale = 1         # divisor de coordenadas del lienzo actual
+canvas = screen       # superficie donde dibujan los draw_*
+_framebuffer = None
+
+
+def art_rect(x, y, w, h):
+    """Rectángulo de pantalla en coordenadas del lienzo."""
+    s = art_scale
+    if s == 1:
+        return (x, y, w, h)
+    return (x // s, y // s, -(-w // s), -(-h // s))
+
+
+def art_point(x, y):
+    return (x // art_scale, y // art_scale)
+
+
+def art_size(v):
+    return max(1, -(-v // art_scale))
+
+
+def art_to_screen(rect):
+    """Rectángulo del lienzo en coordenadas de pantalla (para el modo sucio)."""
+    s = art_scale
+    if rect is None or s == 1:
+        return rect
+    return pygame.Rect(rect[0] * s, rect[1] * s, rect[2] * s, rect[3] * s)
+
+
+def begin_scene():
+    """Empieza a dibujar la escena: en el framebuffer o directo en pantalla."""
+    global art_scale, canvas, _framebuffer
+    if not lowres_enabled:
+        return
+    if _framebuffer is None:
+        size = (WIDTH // PIXEL, HEIGHT // PIXEL)
+        # con texturas es una capa de primitivas más: necesita transparencia
+        _framebuffer = pygame.Surface(size, pygame.SRCALPHA) if gpu is not None else pygame.Surface(size).convert()
+    art_scale = PIXEL
+    canvas = _framebuffer
+
+
+def end_scene():
+    """Amplía el framebuffer a la pantalla; lo que siga se dibuja a resolución completa."""
+    global art_scale, canvas
+    if canvas is not screen:
+        if gpu is not None:
+            # el Renderer amplía cada copia al presentar; como en software, el
+            # cuadro ampliado tapa lo que hubiera en la pantalla
+            gpu.base = canvas
+            gpu.wipe(screen)
+        else:
+            pygame.transform.scale(canvas, (WIDTH, HEIGHT), screen)
+    art_scale = 1
+    canvas = screen
+
+
+def toggle_lowres():
+    global lowres_enabled
+    lowres_enabled = not lowres_enabled
+    invalidate_frame()
+
+# -----------------------------
+# RENDERIZADOR DE TEXTURAS (SDL2)
+# -----------------------------
+# Opcional (NASCAR_RENDER=texturas): el cuadro se compone con un Renderer de
+# pygame._sdl2.video. Todo lo que ya es una superficie cacheada se sube una sola
+# vez como textura y cada cuadro es una cola de copias en el orden de dibujo: la
+# tira de la carretera (con la ventana desplazada como srcrect), los faroles,
+# las luces (con mezcla aditiva), carros, partículas, halo del turbo y textos.
+# Lo que se dibuja con primitivas (árboles, meta, trofeo) va a una capa
+# transparente del tamaño del lienzo; de ella solo se suben y se copian las
+# zonas anotadas con mark_layer(), en el punto de la cola que marca
+# scene_layer() (sin marca, debajo de todo). En baja resolución lo del lienzo
+# se compone en una textura destino del tamaño del framebuffer y se amplía una
+# sola vez, como en software. Sin SDL2 (o si el Renderer no se puede crear) se usa el
+# camino de software de siempre, que es también la referencia de --verificar-texturas.
+
+TEXTURE_CACHE_MAX = 512
+TEXTURE_BLEND_NONE = 0   # SDL_BLENDMODE_NONE
+TEXTURE_BLEND_ALPHA = 1  # SDL_BLENDMODE_BLEND
+TEXTURE_BLEND_ADD = 2    # SDL_BLENDMODE_ADD
+
+
+class TextureRenderer:
+    """Cola de copias de textura por cuadro más las capas de primitivas."""
+
+    def __init__(self, hidden=False):
+        self.window = sdl2_video.Window(pygame.display.get_caption()[0] or "NASCAR",
+                                        (WIDTH, HEIGHT), hidden=hidden)
+        self.renderer = sdl2_video.Renderer(self.window)
+        self._textures = OrderedDict()  # id(superficie) -> (superficie, textura)
+        self._layers = {}               # tamaño -> textura de streaming de una capa
+        self._areas = {}                # id(capa) -> zonas anotadas desde que se borró
+        self._target = None             # textura destino del framebuffer de baja resolución
+        self.queue = []                 # (textura, destino, origen); (None, capa, None) = capa
+        self.low_queue = []             # lo mismo, en coordenadas del framebuffer
+        self.clear_color = BLACK
+        self.layer = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)  # hace de 'screen'
+        self.base = None                # framebuffer de baja resolución del cuadro
+
+    def texture(self, surface, blend=None):
+        """Textura de un sprite que no cambia; se sube la primera vez que se usa."""
+        key = id(surface)
+        entry = self._textures.get(key)
+        if entry is not None:
+            self._textures.move_to_end(key)
+            return entry[1]
+        tex = sdl2_video.Texture.from_surface(self.renderer, surface)
+        if blend is not None:
+            tex.blend_mode = blend
+        # se guarda también la superficie: mientras siga aquí su id no se reutiliza
+        self._textures[key] = (surface, tex)
+        if len(self._textures) > TEXTURE_CACHE_MAX:
+            self._textures.popitem(last=False)
+        return tex
+
+    def copy(self, surface, dest, volatile=False, area=None, additive=False, lowres=False):
+        """Encola una copia de 'area' del sprite (todo si es None); 'volatile'
+        sube la superficie sin cachearla, 'additive' la suma al cuadro y
+        'lowres' la dibuja en el framebuffer de baja resolución."""
+        if volatile:
+            tex = sdl2_video.Texture.from_surface(self.renderer, surface)
+        else:
+            tex = self.texture(surface, TEXTURE_BLEND_ADD if additive else None)
+        (self.low_queue if lowres else self.queue).append((tex, dest, area))
+
+    def queue_layer(self, surface, lowres=False):
+        """Las primitivas de la capa 'surface' se componen en este punto de la cola."""
+        (self.low_queue if lowres else self.queue).append((None, surface, None))
+
+    def fill(self, surface, color):
+        """El equivalente de surface.fill(color) al empezar un cuadro: 'color'
+        pasa a ser el de borrado, la cola se vacía y la capa queda transparente."""
+        self.clear_color = color
+        self.queue.clear()
+        self.low_queue.clear()
+        self.wipe(surface)
+
+    def wipe(self, surface):
+        """Deja transparente la capa (solo las zonas usadas, si se conocen); desde
+        ahora se suben de ella únicamente las zonas anotadas con mark()."""
+        areas = self._areas.get(id(surface))
+        if areas is None:
+            surface.fill((0, 0, 0, 0))
+        else:
+            for rect in areas:
+                surface.fill((0, 0, 0, 0), rect)
+        self._areas[id(surface)] = []
+
+    def mark(self, surface, rect):
+        areas = self._areas.get(id(surface))
+        if areas is not None:
+            rect = pygame.Rect(rect).clip(surface.get_rect())
+            if rect.w and rect.h:
+                areas.append(rect)
+
+    def _draw_layer(self, surface):
+        size = surface.get_size()
+        tex = self._layers.get(size)
+        if tex is None:
+            tex = self._layers[size] = sdl2_video.Texture(self.renderer, size, streaming=True)
+            tex.blend_mode = TEXTURE_BLEND_ALPHA
+        areas = self._areas.get(id(surface))
+        # una capa que nunca se borró con wipe() se sube entera
+        for r in (surface.get_rect(),) if areas is None else areas:
+            tex.update(surface.subsurface(r), r)
+            tex.draw(srcrect=r, dstrect=r)
+
+    def _apply(self, queue, layer):
+        """Capa sin marca en la cola (debajo de todo) y luego la cola en orden."""
+        if not any(tex is None and dest is layer for tex, dest, _ in queue):
+            self._draw_layer(layer)
+        for tex, dest, area in queue:
+            if tex is None:
+                self._draw_layer(dest)
+            else:
+                tex.draw(srcrect=area, dstrect=dest)
+        queue.clear()
+
+    def compose(self):
+        """Borra con el color de fondo y aplica la cola en orden (sin presentar)."""
+        renderer = self.renderer
+        renderer.draw_color = pygame.Color(self.clear_color)
+        if self.base is not None:
+            size = self.base.get_size()
+            if self._target is None or self._target.get_rect().size != size:
+                self._target = sdl2_video.Texture(renderer, size, target=True)
+                self._target.blend_mode = TEXTURE_BLEND_NONE
+            renderer.target = self._target
+            renderer.clear()
+            self._apply(self.low_queue, self.base)
+            renderer.target = None
+            self._target.draw(dstrect=(0, 0, WIDTH, HEIGHT))
+            self.base = None
+        else:
+            renderer.clear()
+            self.low_queue.clear()
+        self._apply(self.queue, self.layer)
+
+    def present(self):
+        self.compose()
+        self.renderer.present()
+
+    def close(self):
+        self.queue.clear()
+        self.low_queue.clear()
+        self._textures.clear()
+        self._layers.clear()
+        self._areas.clear()
+        self._target = None
+        self.window.destroy()
+
+
+gpu = None
+render_backend = "software"
+
+
+def set_render_backend(name, hidden=False):
+    """Cambia entre "software" y "texturas". Si el Renderer no está disponible
+    se queda en software. Devuelve el backend activo."""
+    global gpu, render_backend, screen, canvas, _framebuffer
+    if gpu is not None:
+        gpu.close()
+        gpu = None
+    if name == "texturas" and sdl2_video is not None:
+        try:
+            gpu = TextureRenderer(hidden)
+        except (pygame.error, RuntimeError) as exc:  # los errores de _sdl2 son RuntimeError
+            print(f"Renderizador de texturas no disponible ({exc}): se usa el de software")
+    render_backend = "texturas" if gpu is not None else "software"
+    # con texturas se dibuja en la capa transparente; el framebuffer se rehace
+    # porque en ese modo también necesita transparencia
+    screen = canvas = gpu.layer if gpu is not None else pygame.display.get_surface()
+    _framebuffer = None
+    return render_backend
+
+
+def blit_sprites(surf, seq, doreturn=True):
+    """Como surf.blits(seq, doreturn): cada elemento es (sprite, posición) o
+    (sprite, posición, zona del sprite, special_flags). Con el renderizador de
+    texturas, lo que va al lienzo o a la pantalla se encola como copia de
+    textura (BLEND_RGB_ADD se vuelve mezcla aditiva); los sprites tienen que
+    ser superficies cacheadas que no cambian."""
+    if gpu is None or (surf is not canvas and surf is not screen):
+        return surf.blits(seq, doreturn)
+    lowres = surf is not screen
+    rects = []
+    for item in seq:
+        sprite, pos = item[0], item[1]
+        area = item[2] if len(item) > 2 else None
+        additive = len(item) > 3 and item[3] == pygame.BLEND_RGB_ADD
+        w, h = sprite.get_size() if area is None else area[2:]
+        gpu.copy(sprite, (pos[0], pos[1], w, h), area=area, additive=additive, lowres=lowres)
+        if doreturn:
+            rects.append(pygame.Rect(pos[0], pos[1], w, h))
+    return rects if doreturn else None
+
+
+def clear_scene(surf, color):
+    """Rellena el fondo del cuadro. Con el renderizador de texturas 'color' es
+    el de borrado del Renderer y la capa de primitivas queda transparente."""
+    if gpu is None:
+        surf.fill(color)
+    else:
+        gpu.fill(surf, color)
+
+
+def scene_layer():
+    """Con el renderizador de texturas, lo dibujado con primitivas en el lienzo
+    se compone en este punto del orden de dibujo."""
+    if gpu is not None:
+        gpu.queue_layer(canvas, canvas is not screen)
+
+
+def mark_layer(rect):
+    """Anota una zona (en coordenadas de pantalla) dibujada con primitivas en
+    el lienzo: con el renderizador de texturas solo esas zonas se suben."""
+    if gpu is not None:
+        s = art_scale
+        gpu.mark(canvas, art_rect(rect[0], rect[1], rect[2] + s - 1, rect[3] + s - 1))
+
+
+if _want_textures and set_render_backend("texturas") == "software":
+    # sin Renderer: se vuelve a mostrar la ventana normal
+    screen = canvas = pygame.display.set_mode((WIDTH, HEIGHT))
+
+
+# -----------------------------
+# ENTIDADES (OBSTÁCULOS, ÁRBOLES, FAROLES)
+# -----------------------------
+# Todas las entidades que se desplazan viven en un almacén por columnas
+# (x, y, w, h, tipo). Con NumPy el desplazamiento y la limpieza son operaciones
+# vectorizadas; sin NumPy se usan listas por columna con el mismo comportamiento.
+
+KIND_OBSTACLE, KIND_TREE, KIND_LAMP = 0, 1, 2
+ENTITY_KINDS = 3
+# límite inferior a partir del cual cada tipo sale de pantalla y se elimina
+ENTITY_CULL_Y = (HEIGHT + 50, HEIGHT + 80, HEIGHT + 140)
+
+
+class EntityStore:
+    """Almacén estructura-de-arreglos. El orden de inserción se conserva al
+    eliminar, así que las entidades de un tipo quedan ordenadas por aparición.
+    Cada entidad recibe un id creciente ('eid') que la identifica aunque su
+    fila cambie al compactar; 'lane' es el carril de los obstáculos (-1 si no tiene)."""
+
+    COLUMNS = ("x", "y", "w", "h", "kind", "lane", "eid")
+
+    def __init__(self, capacity=128):
+        self.n = 0
+        self.capacity = capacity
+        self.next_eid = 0
+        if np is not None:
+            # float64 como los float de Python: con o sin NumPy la simulación
+            # da exactamente lo mismo y las grabaciones se repiten igual
+            self.x = np.zeros(capacity, np.float64)
+            self.y = np.zeros(capacity, np.float64)
+            self.w = np.zeros(capacity, np.int16)
+            self.h = np.zeros(capacity, np.int16)
+            self.kind = np.zeros(capacity, np.int8)
+            self.lane = np.zeros(capacity, np.int8)
+            self.eid = np.zeros(capacity, np.int64)
+        else:
+            self.x, self.y, self.w, self.h, self.kind, self.lane, self.eid = [], [], [], [], [], [], []
+        self._rect = pygame.Rect(0, 0, 0, 0)
+
+    def clear(self):
+        self.n = 0
+        if np is None:
+            for name in self.COLUMNS:
+                getattr(self, name).clear()
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def spawn(self, kind, x, y, w, h, lane=-1):
+        """Agrega una entidad y devuelve su eid."""
+        return self.spawn_batch(kind, (x,), (y,), w, h, lane)
+
+    def spawn_batch(self, kind, xs, ys, w, h, lane=-1):
+        """Agrega varias entidades del mismo tipo y tamaño de una vez.
+        Devuelve el eid de la primera; las demás siguen en orden."""
+        count = len(xs)
+        first = self.next_eid
+        if not count:
+            return first
+        eids = range(first, first + count)
+        if np is None:
+            self.x.extend(xs)
+            self.y.extend(ys)
+            self.w.extend([w] * count)
+            self.h.extend([h] * count)
+            self.kind.extend([kind] * count)
+            self.lane.extend([lane] * count)
+            self.eid.extend(eids)
+        else:
+            if self.n + count > self.capacity:
+                self._grow(self.n + count)
+            end = self.n + count
+            self.x[self.n:end] = xs
+            self.y[self.n:end] = ys
+            self.w[self.n:end] = w
+            self.h[self.n:end] = h
+            self.kind[self.n:end] = kind
+            self.lane[self.n:end] = lane
+            self.eid[self.n:end] = eids
+        self.n += count
+        self.next_eid += count
+        return first
+
+    def row_of(self, eid):
+        """Fila actual de una entidad, o -1 si ya fue eliminada. Los eid están
+        ordenados porque el almacén conserva el orden de inserción: O(log n)."""
+        n = self.n
+        if np is None:
+            row = bisect.bisect_left(self.eid, eid)
+        else:
+            row = int(np.searchsorted(self.eid[:n], eid))
+        if row < n and self.eid[row] == eid:
+            return row
+        return -1
+
+    def scroll(self, speeds):
+        """Mueve cada entidad hacia abajo según la velocidad de su tipo."""
+        if np is None:
+            self.y = [y + speeds[k] for y, k in zip(self.y, self.kind)]
+        else:
+            n = self.n
+            self.y[:n] += np.asarray(speeds, np.float64)[self.kind[:n]]
+
+    def cull(self, limits=ENTITY_CULL_Y):
+        """Elimina de una vez las entidades que pasaron su límite inferior.
+        Devuelve cuántas se eliminaron de cada tipo."""
+        removed = [0] * ENTITY_KINDS
+        if np is None:
+            keep = [y <= limits[k] for y, k in zip(self.y, self.kind)]
+            if all(keep):
+                return removed
+            for k, kept in zip(self.kind, keep):
+                if not kept:
+                    removed[k] += 1
+            for name in self.COLUMNS:
+                col = getattr(self, name)
+                setattr(self, name, [v for v, kept in zip(col, keep) if kept])
+            self.n = len(self.y)
+            return removed
+        n = self.n
+        kinds = self.kind[:n]
+        keep = self.y[:n] <= np.asarray(limits, np.float64)[kinds]
+        if keep.all():
+            return removed
+        removed = np.bincount(kinds[~keep], minlength=ENTITY_KINDS).tolist()
+        kept = int(keep.sum())
+        for name in self.COLUMNS:
+            col = getattr(self, name)
+            col[:kept] = col[:n][keep]
+        self.n = kept
+        return removed
+
+    def snapshot(self):
+        """Estado completo del almacén en valores simples (para rebobinar)."""
+        if np is None:
+            cols = tuple(list(getattr(self, name)) for name in self.COLUMNS)
+        else:
+            cols = tuple(getattr(self, name)[:self.n].tobytes() for name in self.COLUMNS)
+        return self.n, self.next_eid, cols
+
+    def restore(self, state):
+        n, self.next_eid, cols = state
+        if np is None:
+            for name, values in zip(self.COLUMNS, cols):
+                setattr(self, name, list(values))
+        else:
+            if n > self.capacity:
+                self._grow(n)
+            for name, data in zip(self.COLUMNS, cols):
+                col = getattr(self, name)
+                col[:n] = np.frombuffer(data, col.dtype)
+        self.n = n
+
+    def indices(self, kind):
+        if np is None:
+            return [i for i, k in enumerate(self.kind) if k == kind]
+        return np.flatnonzero(self.kind[:self.n] == kind).tolist()
+
+    def count(self, kind):
+        if np is None:
+            return self.kind.count(kind)
+        return int(np.count_nonzero(self.kind[:self.n] == kind))
+
+    def rects(self, kind, dy=0):
+        """Recorre las entidades de un tipo como un pygame.Rect reutilizado
+        (desplazado 'dy' en vertical); no se debe guardar el Rect devuelto."""
+        r = self._rect
+        x, y, w, h = self.x, self.y, self.w, self.h
+        for i in self.indices(kind):
+            r.update(int(x[i]), int(y[i]) + dy, int(w[i]), int(h[i]))
+            yield r
+
+
+entities = EntityStore()
+
+# -----------------------------
+# COLISIONES
+# -----------------------------
+# Fase amplia: cada obstáculo se guarda (por eid) en el cubo de su carril. Dentro
+# de un carril todos bajan a la misma velocidad, así que el cubo queda ordenado
+# de más abajo a más arriba y la ventana vertical del jugador corta el recorrido
+# en cuanto aparece el primer obstáculo por encima de él.
+# Fase fina: solo los candidatos de la fase amplia se prueban con las máscaras
+# pixel a pixel de los sprites cacheados.
+
+lane_buckets = [deque() for _ in LANE_OFFSETS]
+
+
+def reset_collisions():
+    for bucket in lane_buckets:
+        bucket.clear()
+
+
+def rebuild_lane_buckets():
+    """Vuelve a llenar los cubos desde el almacén (después de restaurarlo)."""
+    reset_collisions()
+    for row in entities.indices(KIND_OBSTACLE):
+        lane_buckets[int(entities.lane[row])].append(int(entities.eid[row]))
+
+
+def broad_phase_candidates(px, py, pw, ph):
+    """Filas de obstáculos cuyo rectángulo se cruza con el del jugador."""
+    store = entities
+    for bucket in lane_buckets:
+        # los obstáculos más viejos salen primero de pantalla: se purgan por la izquierda
+        while bucket and store.row_of(bucket[0]) < 0:
+            bucket.popleft()
+        for eid in bucket:
+            row = store.row_of(eid)
+            if row < 0:
+                continue
+            y = store.y[row]
+            if y >= py + ph:
+                continue  # ya pasó por debajo del jugador
+            if y + store.h[row] <= py:
+                break  # este y todos los siguientes están más arriba
+            x = store.x[row]
+            if x < px + pw and x + store.w[row] > px:
+                yield row
+
+
+def player_collides(px, py, boosting):
+    """True si el carro del jugador toca algún obstáculo (máscaras pixel a pixel)."""
+    player_mask = None
+    for row in broad_phase_candidates(px, py, CAR_W, CAR_H):
+        if player_mask is None:
+            player_mask = get_car_mask(BLUE, 1.0, boosting)
+        obs_mask = get_car_mask(RED, 1.0, boosting, damaged=True)
+        offset = (int(entities.x[row]) - px, int(entities.y[row]) - py)
+        if player_mask.overlap(obs_mask, offset):
+            return True
+    return False
+
+# -----------------------------
+# PELOTÓN RIVAL
+# -----------------------------
+# Entre 20 y 40 rivales corren su propia carrera: cada uno con progreso, carril,
+# ritmo base y un vaivén de ritmo propio. Van por columnas como las entidades y
+# todo el pelotón se actualiza en un lote por paso. Un carro que lleva a otro
+# justo delante en su carril aprovecha el rebufo (va un poco más rápido) y, si
+# se le pega demasiado, sale a un carril vecino para pasarlo.
+# 'rival_base' es el ritmo del más rápido (el mismo del antiguo rival único);
+# los demás van más lentos, así que el jugador puede pasarlos.
+
+RIVAL_SKILL_MIN = 0.35          # ritmo del más lento, como fracción de rival_base
+RIVAL_PACE_SWING = 0.08         # vaivén del ritmo (±8 %)
+RIVAL_DRAFT_GAP = 6.0           # hasta esta distancia (en progreso) hay rebufo
+RIVAL_DRAFT_BONUS = 0.06        # ritmo extra con rebufo
+RIVAL_PASS_GAP = 3.2            # más cerca que esto (un carro de largo), intenta pasar
+RIVAL_LANE_COOLDOWN = 90        # pasos entre dos cambios de carril del mismo carro
+RIVAL_LANE_SHIFT = 0.05         # carriles por paso al cambiar (solo visual)
+RIVAL_GRID_ROW_GAP = 4.0        # separación entre filas de la parrilla de salida
+RIVAL_PX_PER_PROGRESS = 30      # cuánto se separan en pantalla por unidad de progreso
+RIVAL_SCALE = 0.9
+RIVAL_COLORS = (ORANGE, (250, 210, 40), GREEN, (150, 70, 200),
+                (235, 235, 235), (0, 170, 170), (230, 90, 160), (110, 110, 125))
+LANE_SPACING = LANE_OFFSETS[1] - LANE_OFFSETS[0]
+
+
+class RivalField:
+    """Pelotón estructura-de-arreglos. Con o sin NumPy se hacen las mismas
+    cuentas en el mismo orden, así que el resultado de la carrera (y las
+    grabaciones) no depende de si NumPy está instalado."""
+
+    COLUMNS = ("progress", "rate", "phase", "freq", "lane", "lane_x", "cooldown", "color")
+    INT_COLUMNS = ("lane", "cooldown", "color")
+
+    def __init__(self):
+        self.n = 0
+        self.tick = 0
+        self.clear()
+
+    def clear(self):
+        self.n = 0
+        self.tick = 0
+        for name in self.COLUMNS:
+            setattr(self, name, [] if np is None else np.zeros(0))
+
+    def reset(self, count, rng, base_rate):
+        """Arma la parrilla: 'count' carros en filas de un carro por carril; la
+        primera fila larga a la par del jugador y el resto detrás. El primer
+        carro corre a 'base_rate' (el ritmo del rival único de antes) y los
+        demás, entre RIVAL_SKILL_MIN y 1 vez 'base_rate'."""
+        lanes = len(LANE_OFFSETS)
+        cols = {name: [] for name in self.COLUMNS}
+        for i in range(count):
+            row, lane = divmod(i, lanes)
+            cols["progress"].append(-row * RIVAL_GRID_ROW_GAP)
+            skill = 1.0 if i == 0 else RIVAL_SKILL_MIN + (1.0 - RIVAL_SKILL_MIN) * rng.random()
+            cols["rate"].append(base_rate * skill)
+            cols["phase"].append(2.0 * rng.random())
+            cols["freq"].append(0.002 + 0.004 * rng.random())   # un vaivén cada 4-8 s
+            cols["lane"].append(lane)
+            cols["lane_x"].append(float(lane))
+            cols["cooldown"].append(0)
+            cols["color"].append(rng.randrange(len(RIVAL_COLORS)))
+        for name, values in cols.items():
+            if np is not None:
+                values = np.array(values, self._dtype(name))
+            setattr(self, name, values)
+        self.n = count
+        self.tick = 0
+
+    def _dtype(self, name):
+        return np.int64 if name in self.INT_COLUMNS else np.float64
+
+    def snapshot(self):
+        """Estado completo del pelotón en valores simples (para rebobinar)."""
+        if np is None:
+            cols = tuple(list(getattr(self, name)) for name in self.COLUMNS)
+        else:
+            cols = tuple(getattr(self, name).tobytes() for name in self.COLUMNS)
+        return self.n, self.tick, cols
+
+    def restore(self, state):
+        self.n, self.tick, cols = state
+        for name, values in zip(self.COLUMNS, cols):
+            if np is None:
+                values = list(values)
+            else:
+                values = np.frombuffer(values, self._dtype(name)).copy()
+            setattr(self, name, values)
+
+    def _gaps_ahead(self):
+        """Distancia al carro de adelante en el mismo carril (inf si no hay)."""
+        n, progress, lane = self.n, self.progress, self.lane
+        if np is None:
+            gaps = [math.inf] * n
+            order = sorted(range(n), key=lambda i: (lane[i], progress[i]))
+            for a, b in zip(order, order[1:]):
+                if lane[a] == lane[b]:
+                    gaps[a] = progress[b] - progress[a]
+            return gaps
+        order = np.lexsort((progress, lane))
+        p, l = progress[order], lane[order]
+        ahead = np.full(n, np.inf)
+        ahead[:-1] = np.where(l[1:] == l[:-1], p[1:] - p[:-1], np.inf)
+        gaps = np.empty(n)
+        gaps[order] = ahead
+        return gaps
+
+    def step(self, pace=1.0):
+        """Avanza un paso fijo a todo el pelotón; 'pace' multiplica todos los ritmos."""
+        if not self.n:
+            return
+        t = self.tick
+        self.tick += 1
+        gaps = self._gaps_ahead()
+        last_lane = len(LANE_OFFSETS) - 1
+        if np is None:
+            for i in range(self.n):
+                wave = abs((t * self.freq[i] + self.phase[i]) % 2.0 - 1.0)
+                rate = self.rate[i]
+                speed = rate * (1.0 - RIVAL_PACE_SWING + 2.0 * RIVAL_PACE_SWING * wave) * pace
+                gap = gaps[i]
+                if gap < RIVAL_DRAFT_GAP:
+                    speed = speed + rate * RIVAL_DRAFT_BONUS
+                lane = self.lane[i]
+                if gap < RIVAL_PASS_GAP and self.cooldown[i] == 0:
+                    side = 1 if i % 2 else -1
+                    target = lane + side
+                    self.lane[i] = lane = target if 0 <= target <= last_lane else lane - side
+                    self.cooldown[i] = RIVAL_LANE_COOLDOWN
+                elif self.cooldown[i]:
+                    self.cooldown[i] -= 1
+                self.progress[i] += speed
+                self.lane_x[i] += max(-RIVAL_LANE_SHIFT, min(RIVAL_LANE_SHIFT, lane - self.lane_x[i]))
+            return
+        rate = self.rate
+        wave = np.abs((t * self.freq + self.phase) % 2.0 - 1.0)
+        speed = rate * (1.0 - RIVAL_PACE_SWING + 2.0 * RIVAL_PACE_SWING * wave) * pace
+        speed = np.where(gaps < RIVAL_DRAFT_GAP, speed + rate * RIVAL_DRAFT_BONUS, speed)
+        passing = (gaps < RIVAL_PASS_GAP) & (self.cooldown == 0)
+        if passing.any():
+            side = np.where(np.arange(self.n) % 2 == 1, 1, -1)
+            target = self.lane + side
+            target = np.where((target >= 0) & (target <= last_lane), target, self.lane - side)
+            self.lane = np.where(passing, target, self.lane)
+        self.cooldown = np.where(passing, RIVAL_LANE_COOLDOWN, np.maximum(self.cooldown - 1, 0))
+        self.progress += speed
+        self.lane_x += np.clip(self.lane - self.lane_x, -RIVAL_LANE_SHIFT, RIVAL_LANE_SHIFT)
+
+    def leader(self):
+        """Progreso del primero del pelotón (0 si no hay rivales)."""
+        if not self.n:
+            return 0.0
+        return float(max(self.progress) if np is None else self.progress.max())
+
+    def position_of(self, progress):
+        """Puesto (1 = primero) de quien lleva 'progress' dentro del pelotón."""
+        if np is None:
+            return 1 + sum(p > progress for p in self.progress)
+        return 1 + int(np.count_nonzero(self.progress > progress))
+
+    def draw(self, surf, player_progress, road_left_x, boosting):
+        """Dibuja solo los carros que caen en pantalla, en un único 'blits' con
+        los sprites cacheados. Devuelve las zonas dibujadas en coordenadas de pantalla."""
+        if not self.n:
+            return []
+        x0 = road_left_x + LANE_OFFSETS[0] + (CAR_W - int(CAR_W * RIVAL_SCALE)) // 2
+        y0 = player_y + player_progress * RIVAL_PX_PER_PROGRESS
+        top = -int(CAR_H * RIVAL_SCALE)
+        if np is None:
+            rows = [i for i, p in enumerate(self.progress)
+                    if top < y0 - p * RIVAL_PX_PER_PROGRESS < HEIGHT]
+        else:
+            ys = y0 - self.progress * RIVAL_PX_PER_PROGRESS
+            rows = np.flatnonzero((ys > top) & (ys < HEIGHT)).tolist()
+        if not rows:
+            return []
+        sprites = {}
+        seq = []
+        for i in rows:
+            c = int(self.color[i])
+            sprite = sprites.get(c)
+            if sprite is None:
+                sprite = sprites[c] = get_car_sprite(RIVAL_COLORS[c], RIVAL_SCALE, boosting)
+            x = x0 + self.lane_x[i] * LANE_SPACING
+            y = y0 - self.progress[i] * RIVAL_PX_PER_PROGRESS
+            seq.append((sprite, art_point(int(x), int(y))))
+        return [art_to_screen(r) for r in blit_sprites(surf, seq)]
+
+
+rival_field = RivalField()
+
+
+def race_position():
+    """Puesto del jugador y total de carros en carrera (rivales + jugador)."""
+    return rival_field.position_of(player_progress), rival_field.n + 1
 
 # -----------------------------
 # DIBUJO PIXEL-ART DE ELEMENTOS
 # -----------------------------
 
-def draw_road_pixel(vis_alpha, dist):
-    """Carretera pixelada con contornos de asfalto, borde y líneas de carril.
-    Añadimos una ligera textura de bandas para dar sensación de profundidad."""
-    road_left_x = get_road_center_x(dist) - ROAD_WIDTH // 2
+# Tira de carretera pre-renderizada (asfalto, bandas, grava y línea central).
+# La textura se repite cada ROAD_TEXTURE_PERIOD píxeles, así que la tira mide
+# HEIGHT + periodo y cada cuadro solo se copia la ventana desplazada.
+ROAD_GRAVEL_W = 18
+ROAD_BAND_H = 6
+ROAD_BAND_STEP = ROAD_BAND_H * 6
+ROAD_DASH_H = 28
+ROAD_DASH_GAP = 18
+ROAD_TEXTURE_PERIOD = math.lcm(ROAD_BAND_STEP, ROAD_DASH_H + ROAD_DASH_GAP)
+
+_road_strip_cache = {}
+
+
+def build_road_strip():
+    """Dibuja una vez la tira completa de la carretera, incluida la grava."""
+    strip_w = ROAD_WIDTH + 2 * ROAD_GRAVEL_W
+    strip_h = HEIGHT + ROAD_TEXTURE_PERIOD
+    strip = pygame.Surface((art_size(strip_w), art_size(strip_h))).convert()
+    left = ROAD_GRAVEL_W
     # capa asfalto base
-    pygame.draw.rect(screen, DARK_GRAY, (road_left_x, 0, ROAD_WIDTH, HEIGHT))
+    strip.fill(DARK_GRAY, art_rect(left, 0, ROAD_WIDTH, strip_h))
 
     # textura: bandas horizontales delgadas (pixel style)
-    band_h = 6
-    for y in range(0, HEIGHT, band_h * 6):
+    for y in range(0, strip_h, ROAD_BAND_STEP):
         for x_off in range(0, ROAD_WIDTH, 8 * PIXEL):
             shade = max(20, 60 - (x_off // 12))
-            color = (shade, shade, shade)
-            pygame.draw.rect(screen, color, (road_left_x + x_off, y, 8 * PIXEL, band_h))
+            strip.fill((shade, shade, shade), art_rect(left + x_off, y, 8 * PIXEL, ROAD_BAND_H))
 
     # borde de la carretera (grava)
-    gravel_w = 18
-    pygame.draw.rect(screen, (100, 92, 82), (road_left_x - gravel_w, 0, gravel_w, HEIGHT))
-    pygame.draw.rect(screen, (100, 92, 82), (road_left_x + ROAD_WIDTH, 0, gravel_w, HEIGHT))
+    strip.fill((100, 92, 82), art_rect(0, 0, ROAD_GRAVEL_W, strip_h))
+    strip.fill((100, 92, 82), art_rect(left + ROAD_WIDTH, 0, ROAD_GRAVEL_W, strip_h))
 
     # líneas de centro (pixel-dashed)
-    center_x = get_road_center_x(dist)
-    dash_h = 28
-    gap = 18
-    x = center_x - 6
-    for y in range(0, HEIGHT, dash_h + gap):
-        # dibujamos bloques pequeños (pixelized)
-        for dx in range(0, 12, PIXEL*3):
-            pixel_rect(screen, x + dx, y, PIXEL*3, dash_h, WHITE)
-
-    # overlay por visibilidad (oscuridad que aumenta con dificultad)
-    overlay = pygame.Surface((WIDTH, HEIGHT))
-    overlay.fill((0, 0, 0))
-    overlay.set_alpha(int(vis_alpha))
-    screen.blit(overlay, (0, 0))
+    x = left + ROAD_WIDTH // 2 - 6
+    pixel_rects(strip, [(x + dx, y, PIXEL*3, ROAD_DASH_H)
+                        for y in range(0, strip_h, ROAD_DASH_H + ROAD_DASH_GAP)
+                        for dx in range(0, 12, PIXEL*3)], WHITE)
+    return strip
+
+
+def get_road_strip(vis_alpha=0):
+    """Tira cacheada con la oscuridad del nivel ya aplicada: la visibilidad es
+    fija durante la carrera, así que oscurecer no cuesta nada por cuadro."""
+    key = (ROAD_WIDTH, PIXEL, int(vis_alpha), art_scale)
+    strip = _road_strip_cache.get(key)
+    if strip is None:
+        _road_strip_cache.clear()
+        strip = build_road_strip()
+        if vis_alpha > 0:
+            k = 255 - min(255, int(vis_alpha))
+            strip.fill((k, k, k), special_flags=pygame.BLEND_RGB_MULT)
+        _road_strip_cache[key] = strip
+    return strip
+
+
+def draw_road_pixel(vis_alpha, dist, scroll=0.0):
+    """Carretera pixelada con contornos de asfalto, borde y líneas de carril.
+    Añadimos una ligera textura de bandas para dar sensación de profundidad.
+    La textura sale de la tira cacheada: 'scroll' la desplaza en vertical y
+    get_road_center_x(dist) la mueve en horizontal siguiendo la curva.
+    La oscuridad por visibilidad (aumenta con dificultad) viene incluida en la tira.
+    Devuelve la zona dibujada en coordenadas de pantalla."""
+    strip = get_road_strip(vis_alpha)
+    road_left_x = get_road_center_x(dist) - ROAD_WIDTH // 2
+    top = (ROAD_TEXTURE_PERIOD - int(scroll) % ROAD_TEXTURE_PERIOD) % ROAD_TEXTURE_PERIOD
+    window = (0, top // art_scale, strip.get_width(), HEIGHT // art_scale)
+    drawn = blit_sprites(canvas, ((strip, art_point(road_left_x - ROAD_GRAVEL_W, 0), window),))
+    return art_to_screen(drawn[0])
 
 
 def draw_tree_pixel(rect):
@@ -183,62 +1195,192 @@ def draw_tree_pixel(rect):
     # tronco
     trunk_x = rect.x + 6
     trunk_y = rect.y + 28
-    pixel_rect(screen, trunk_x, trunk_y, 12, 28, (90, 60, 30))
+    pixel_rect(canvas, trunk_x, trunk_y, 12, 28, (90, 60, 30))
     # sombra del tronco
-    pixel_rect(screen, trunk_x + 8, trunk_y + 6, 4, 18, (70, 45, 20))
+    pixel_rect(canvas, trunk_x + 8, trunk_y + 6, 4, 18, (70, 45, 20))
 
     # copa: montículos de píxeles con tonos verdes
     cx = rect.x + 12
     cy = rect.y + 16
     # capa inferior
-    pixel_rect(screen, cx - 18, cy + 10, 36, 18, (20, 120, 40))
+    pixel_rect(canvas, cx - 18, cy + 10, 36, 18, (20, 120, 40))
     # capa media
-    pixel_rect(screen, cx - 22, cy - 2, 44, 20, (10, 150, 55))
+    pixel_rect(canvas, cx - 22, cy - 2, 44, 20, (10, 150, 55))
     # luces (hojas con brillo)
-    pixel_rect(screen, cx - 8, cy + 2, 8, 6, (160, 220, 140))
+    pixel_rect(canvas, cx - 8, cy + 2, 8, 6, (160, 220, 140))
 
-    # borde de sombra bajo la copa
-    pygame.draw.rect(screen, (0, 0, 0, 40), (rect.x, rect.y + rect.h - 6, rect.w, 4))
+    # borde de sombra bajo la copa (el lienzo no tiene alfa: queda negro)
+    pygame.draw.rect(canvas, BLACK, art_rect(rect.x, rect.y + rect.h - 6, rect.w, 4))
+    mark_layer((rect.x - 12, rect.y, rect.w + 24, rect.h))
 
 
-def draw_lamp_pixel(lamp):
-    """Poste con luminaria pixelada y cono de luz sutil pixelado."""
+# -----------------------------
+# ILUMINACIÓN (LIGHTMAP)
+# -----------------------------
+# Los conos y reflejos de los faroles se pre-renderizan una vez como sprites
+# de luz (RGB sobre negro) y cada cuadro se estampan sumando en una única capa
+# de luz. Esa capa se compone sobre la pantalla con un solo blit aditivo, y la
+# oscuridad por visibilidad ya viene horneada en la tira de la carretera: el
+# costo no depende de cuántos faroles haya ni de lo oscuro que sea el nivel.
+
+_light_sprite_cache = {}
+_lightmap = None
+_lightmap_dirty = None      # zona estampada en el cuadro actual
+_lightmap_prev_dirty = None  # zona estampada en el cuadro anterior (a limpiar)
+_lightmap_stamps = []        # zona de cada estampa del cuadro (para el modo sucio)
+_light_copies = []           # con texturas: (sprite, posición, None, BLEND_RGB_ADD) por luz
+
+
+def render_lamp_cone(step=None):
+    """Cono de luz: parche de polígonos semitransparentes (sin caché)."""
+    step = step or PIXEL * 2
+    cone = pygame.Surface((art_size(200), art_size(260)), pygame.SRCALPHA)
+    for i in range(0, 200, step):
+        alpha = max(6, 90 - i // 2)
+        pygame.draw.polygon(cone, (255, 245, 200, alpha),
+                            [art_point(100, 0), art_point(0 + i//4, 200), art_point(200 - i//4, 200)])
+    return cone
+
+
+def render_lamp_reflection():
+    """Reflejo del farol sobre el asfalto, en bloques pixelados (sin caché)."""
+    refl_surface = pygame.Surface((art_size(160), art_size(60)), pygame.SRCALPHA)
+    for i in range(0, 160, PIXEL*3):
+        a = max(10, 120 - i)
+        pixel_rect(refl_surface, i, 0, PIXEL*3, 40, (255, 255, 210, a))
+    return refl_surface
+
+
+def get_light_sprite(kind, step=None):
+    """Sprite de luz aditivo: el parche translúcido compuesto sobre negro."""
+    key = (kind, step, PIXEL, art_scale)
+    sprite = _light_sprite_cache.get(key)
+    if sprite is None:
+        patch = render_lamp_cone(step) if kind == "cone" else render_lamp_reflection()
+        sprite = pygame.Surface(patch.get_size()).convert()
+        sprite.fill(BLACK)
+        sprite.blit(patch, (0, 0))
+        _light_sprite_cache[key] = sprite
+    return sprite
+
+
+def begin_lightmap():
+    """Limpia solo la zona de la capa de luz que se usó en el cuadro anterior."""
+    global _lightmap, _lightmap_dirty, _lightmap_prev_dirty
+    if gpu is not None:
+        # con texturas no hay capa de luz: cada luz es una copia aditiva
+        _lightmap_dirty = None
+        _lightmap_stamps.clear()
+        _light_copies.clear()
+        return
+    if _lightmap is None or _lightmap.get_size() != canvas.get_size():
+        _lightmap = pygame.Surface(canvas.get_size()).convert()
+        _lightmap.fill(BLACK)
+        _lightmap_prev_dirty = None
+    if _lightmap_prev_dirty is not None:
+        _lightmap.fill(BLACK, _lightmap_prev_dirty)
+    _lightmap_prev_dirty = None
+    _lightmap_dirty = None
+    _lightmap_stamps.clear()
+
+
+def stamp_light(sprite, x, y):
+    """Suma un sprite de luz a la capa de luz del cuadro."""
+    global _lightmap_dirty
+    if gpu is not None:
+        _light_copies.append((sprite, art_point(x, y), None, pygame.BLEND_RGB_ADD))
+        return
+    if _lightmap is None:
+        begin_lightmap()
+    r = _lightmap.blit(sprite, art_point(x, y), special_flags=pygame.BLEND_RGB_ADD)
+    if r.w and r.h:
+        _lightmap_dirty = r if _lightmap_dirty is None else _lightmap_dirty.union(r)
+        _lightmap_stamps.append(r)
+
+
+def composite_lightmap(surf=None):
+    """Compone la capa de luz sobre el lienzo con un único blit aditivo."""
+    global _lightmap_prev_dirty
+    surf = surf or canvas
+    if gpu is not None:
+        # la suma saturada da lo mismo luz por luz que sumando antes en una capa
+        blit_sprites(surf, _light_copies, False)
+        _light_copies.clear()
+        return
+    if _lightmap_dirty is not None:
+        surf.blit(_lightmap, _lightmap_dirty.topleft, _lightmap_dirty,
+                  special_flags=pygame.BLEND_RGB_ADD)
+    _lightmap_prev_dirty = _lightmap_dirty
+
+
+# Poste y luminaria del farol: un sprite cacheado. En baja resolución el píxel
+# donde cae cada parte depende de la posición del farol módulo el bloque, así
+# que hay una variante por fase (una sola a resolución completa).
+LAMP_SPRITE_OFFSET = (4, 10)   # de la esquina del sprite a la base del poste
+LAMP_SPRITE_SIZE = (15, 91)    # pixel_rect redondea la cabeza a 15 y el poste a 81
+_lamp_sprite_cache = {}
+
+
+def render_lamp_sprite(phase_x=0, phase_y=0):
+    """Dibuja el farol sobre fondo transparente (sin caché)."""
+    s = art_scale
+    ox, oy = LAMP_SPRITE_OFFSET
+    w, h = LAMP_SPRITE_SIZE
+    # posición ficticia del poste con la fase pedida y lugar para la cabeza
+    pole_x = -(-ox // s) * s + phase_x
+    pole_y = -(-oy // s) * s + phase_y
+    lamp = pygame.Surface((art_size(pole_x - ox + w), art_size(pole_y - oy + h)), pygame.SRCALPHA)
     # poste
-    pole_x = lamp.x
-    pole_y = lamp.y
-    pixel_rect(screen, pole_x, pole_y, 6, 80, (140, 140, 150))
+    pixel_rect(lamp, pole_x, pole_y, 6, 80, (140, 140, 150))
     # cabeza de la lámpara
     head_w, head_h = 14, 10
-    pixel_rect(screen, pole_x - 4, pole_y - head_h, head_w, head_h, (220, 210, 160))
+    pixel_rect(lamp, pole_x - 4, pole_y - head_h, head_w, head_h, (220, 210, 160))
     # bombilla brillante
-    pixel_rect(screen, pole_x + 3, pole_y - 6, 4, 4, YELLOW)
+    pixel_rect(lamp, pole_x + 3, pole_y - 6, 4, 4, YELLOW)
+    left, top = (pole_x - ox) // s, (pole_y - oy) // s
+    return lamp.subsurface((left, top, lamp.get_width() - left, lamp.get_height() - top)).copy()
+
+
+def get_lamp_sprite(x, y):
+    """Sprite cacheado del farol con la base del poste en (x, y) de pantalla."""
+    s = art_scale
+    key = (x % s, y % s, PIXEL, s)
+    sprite = _lamp_sprite_cache.get(key)
+    if sprite is None:
+        sprite = _lamp_sprite_cache[key] = render_lamp_sprite(x % s, y % s)
+    return sprite
+
+
+def draw_lamp_pixel(lamp):
+    """Poste con luminaria pixelada y cono de luz sutil pixelado.
+    El cono se estampa en la capa de luz; se ve al llamar composite_lightmap().
+    Devuelve la zona del poste en coordenadas de pantalla."""
+    ox, oy = LAMP_SPRITE_OFFSET
+    sprite = get_lamp_sprite(lamp.x, lamp.y)
+    drawn = blit_sprites(canvas, ((sprite, art_point(lamp.x - ox, lamp.y - oy)),))
 
-    # cono de luz: hacemos un parche con píxeles semitransparentes
-    cone = pygame.Surface((200, 260), pygame.SRCALPHA)
-    for i in range(0, 200, PIXEL * 2):
-        alpha = max(6, 90 - i // 2)
-        pygame.draw.polygon(cone, (255, 245, 200, alpha), [(100, 0), (0 + i//4, 200), (200 - i//4, 200)])
     # colocamos el cono un poco por delante de la carretera para crear reflejo
-    screen.blit(cone, (lamp.centerx - 100, lamp.y))
+    if quality["conos"]:
+        stamp_light(get_light_sprite("cone"), lamp.centerx - 100, lamp.y)
+    return art_to_screen(drawn[0])
 
 
 def draw_lamp_reflection_pixel(lamp):
-    refl_surface = pygame.Surface((160, 60), pygame.SRCALPHA)
-    for i in range(0, 160, PIXEL*3):
-        a = max(10, 120 - i)
-        pixel_rect(refl_surface, i, 0, PIXEL*3, 40, (255, 255, 210, a))
-    rx = lamp.centerx - 80
-    ry = lamp.y + 30
-    screen.blit(refl_surface, (rx, ry))
+    stamp_light(get_light_sprite("reflection"), lamp.centerx - 80, lamp.y + 30)
 
 
-def draw_car_pixel(x, y, color, wheels_offset=0, scale=1.0):
-    """Carro pixel-art: cuerpo con sombreado, parabrisas y luces.
-    'scale' permite dibujar rivales más pequeños o grandes con el mismo estilo."""
+# Caché de sprites de carros: cada combinación (color, escala, turbo, daño)
+# se dibuja una sola vez en formato de pantalla y luego se reutiliza con un blit.
+CAR_SPRITE_CACHE_MAX = 64
+_car_sprite_cache = OrderedDict()
+
+
+def render_car_sprite(color, scale=1.0, boosting=False, damaged=False):
+    """Dibuja el carro pixel-art en una superficie nueva (sin caché)."""
     w = int(CAR_W * scale)
     h = int(CAR_H * scale)
     # cuerpo principal (rect en pixel blocks)
-    body = pygame.Surface((w, h), pygame.SRCALPHA)
+    body = pygame.Surface((art_size(w), art_size(h)), pygame.SRCALPHA)
     # sombra base
     pixel_rect(body, 0, int(h*0.1), w, int(h*0.8), color)
     # parabrisas
@@ -246,208 +1388,982 @@ def draw_car_pixel(x, y, color, wheels_offset=0, scale=1.0):
     gh = max(6, int(h*0.25))
     pixel_rect(body, int(w*0.18), int(h*0.12), gw, gh, (180, 230, 255))
     # detalles frontales: luces
-    pixel_rect(body, 6, int(h - 18), 6, 6, YELLOW if not is_boosting else LIGHT_BLUE)
-    pixel_rect(body, w - 12, int(h - 18), 6, 6, YELLOW if not is_boosting else LIGHT_BLUE)
+    pixel_rect(body, 6, int(h - 18), 6, 6, YELLOW if not boosting else LIGHT_BLUE)
+    pixel_rect(body, w - 12, int(h - 18), 6, 6, YELLOW if not boosting else LIGHT_BLUE)
     # ruedas (simples) con brillo
-    pygame.draw.circle(body, BLACK, (int(w*0.2), int(h*0.18)), int(8*scale))
-    pygame.draw.circle(body, BLACK, (int(w*0.8), int(h*0.18)), int(8*scale))
-    pygame.draw.circle(body, BLACK, (int(w*0.2), int(h*0.78)), int(8*scale))
-    pygame.draw.circle(body, BLACK, (int(w*0.8), int(h*0.78)), int(8*scale))
+    radius = art_size(int(8*scale))
+    pygame.draw.circle(body, BLACK, art_point(int(w*0.2), int(h*0.18)), radius)
+    pygame.draw.circle(body, BLACK, art_point(int(w*0.8), int(h*0.18)), radius)
+    pygame.draw.circle(body, BLACK, art_point(int(w*0.2), int(h*0.78)), radius)
+    pygame.draw.circle(body, BLACK, art_point(int(w*0.8), int(h*0.78)), radius)
 
     # brillo en el lateral
     pixel_rect(body, int(w*0.6), int(h*0.3), int(w*0.12), int(h*0.18), (255, 255, 255, 40))
 
-    screen.blit(body, (x, y))
+    if damaged:
+        # grieta/panel
+        pixel_rect(body, 8, 28, 12, 8, (120, 20, 20))
+    return body
+
+
+def get_car_sprite(color, scale=1.0, boosting=False, damaged=False):
+    """Devuelve el sprite cacheado; si no existe lo dibuja y descarta el menos usado."""
+    key = (tuple(color), scale, boosting, damaged, art_scale)
+    sprite = _car_sprite_cache.get(key)
+    if sprite is not None:
+        _car_sprite_cache.move_to_end(key)
+        return sprite
+    sprite = render_car_sprite(color, scale, boosting, damaged).convert_alpha()
+    _car_sprite_cache[key] = sprite
+    if len(_car_sprite_cache) > CAR_SPRITE_CACHE_MAX:
+        _car_sprite_cache.popitem(last=False)
+    return sprite
+
+
+# Máscaras de colisión: una por sprite cacheado, calculadas una sola vez.
+# El umbral bajo incluye el brillo lateral semitransparente dentro del carro.
+# race_step nunca corre dentro de begin_scene/end_scene, así que las máscaras
+# salen siempre de los sprites a resolución completa.
+CAR_MASK_ALPHA_THRESHOLD = 10
+_car_mask_cache = OrderedDict()
+
+
+def get_car_mask(color, scale=1.0, boosting=False, damaged=False):
+    """Máscara pixel a pixel del sprite de carro (sin las esquinas transparentes)."""
+    key = (tuple(color), scale, boosting, damaged)
+    mask = _car_mask_cache.get(key)
+    if mask is not None:
+        _car_mask_cache.move_to_end(key)
+        return mask
+    sprite = get_car_sprite(color, scale, boosting, damaged)
+    mask = pygame.mask.from_surface(sprite, CAR_MASK_ALPHA_THRESHOLD)
+    _car_mask_cache[key] = mask
+    if len(_car_mask_cache) > CAR_SPRITE_CACHE_MAX:
+        _car_mask_cache.popitem(last=False)
+    return mask
+
+
+def draw_car_pixel(x, y, color, wheels_offset=0, scale=1.0, damaged=False):
+    """Carro pixel-art: cuerpo con sombreado, parabrisas y luces.
+    'scale' permite dibujar rivales más pequeños o grandes con el mismo estilo.
+    El sprite sale de la caché, así que cada carro cuesta un solo blit.
+    Devuelve la zona dibujada en coordenadas de pantalla."""
+    sprite = get_car_sprite(color, scale, is_boosting, damaged)
+    return art_to_screen(blit_sprites(canvas, ((sprite, art_point(x, y)),))[0])
 
 
 def draw_obstacle_pixel(obs):
     # reutilizamos draw_car_pixel con color rojo y un toque de daño visual
-    draw_car_pixel(obs.x, obs.y, RED, scale=1.0)
-    # grieta/panel
-    pixel_rect(screen, obs.x + 8, obs.y + 28, 12, 8, (120, 20, 20))
+    draw_car_pixel(obs.x, obs.y, RED, scale=1.0, damaged=True)
+
+# -----------------------------
+# PARTÍCULAS
+# -----------------------------
+# Confeti, escape del turbo, humo de llantas y chispas comparten un único
+# almacén de capacidad fija (x, y, vx, vy, ay, vida, sprite). Las vivas ocupan
+# las primeras 'n' filas: emitir escribe filas libres y una partícula que muere
+# se reemplaza por la última (con NumPy, las vivas se compactan en su lugar
+# pasando por búferes de trabajo preasignados), así que ni emitir ni actualizar
+# crean objetos por partícula ni arreglos por cuadro. Cada partícula dibuja un
+# sprite cacheado y todas salen en un solo Surface.blits; lo único que se arma
+# por cuadro es la lista de pares (sprite, posición) que ese blits necesita.
+# Unidades: píxeles y milisegundos. Son solo visuales: usan el módulo random
+# global, no los flujos con semilla de la carrera.
+
+PARTICLE_CAPACITY = 512
+
+# Emisores: zona de salida (ancho, alto) desde el punto dado, velocidad base,
+# dispersión de la velocidad, gravedad, vida en ms y sprites (color, lado).
+CONFETTI_COLORS = ((255, 255, 200), (255, 80, 80), (80, 200, 255), (120, 255, 120),
+                   (255, 220, 60), (230, 120, 255), (255, 160, 60))
+EMITTERS = {
+    "confeti": {"area": (200, 140), "vel": (0.0, 0.02), "jitter": 0.03, "ay": 0.00005,
+                "vida": (250, 600), "sprites": [((255, 255, 200), 4)] + [(c, 3) for c in CONFETTI_COLORS]},
+    "turbo": {"area": (36, 6), "vel": (0.0, 0.3), "jitter": 0.04, "ay": 0.0,
+              "vida": (60, 140), "sprites": [((255, 200, 40), 9), ((255, 120, 10), 6), ((255, 60, 0), 6)]},
+    "humo": {"area": (6, 6), "vel": (0.0, 0.15), "jitter": 0.03, "ay": 0.0,
+             "vida": (200, 400), "sprites": [((170, 170, 170, 110), 9), ((120, 120, 120, 90), 6)]},
+    "chispas": {"area": (4, 24), "vel": (0.0, 0.1), "jitter": 0.35, "ay": 0.001,
+                "vida": (100, 250), "sprites": [((255, 240, 150), 3), (WHITE, 3), (ORANGE, 3)]},
+}
+CONFETTI_PER_FRAME = 6
+TURBO_PER_MS = 0.25          # partículas por ms de turbo
+SMOKE_PER_MS = 0.05          # por ms y por llanta trasera al cambiar de carril
+SPARKS_PER_NEAR_MISS = 14
+NEAR_MISS_PX = 14            # un obstáculo a menos de esto del costado es un roce
+
+_particle_sprites = []
+_particle_sprite_index = {}
+_particle_specs = []             # (color, lado) de cada sprite, para el framebuffer
+_particle_sprites_lowres = []    # los mismos sprites con un píxel por bloque
+_emitter_sprite_ids = {}
+_particle_max_side = 0
+
+
+def get_particle_sprite(color, side):
+    """Índice del sprite cuadrado (lado redondeado a bloques PIXEL) en la tabla."""
+    global _particle_max_side
+    key = (tuple(color), side, PIXEL)
+    index = _particle_sprite_index.get(key)
+    if index is None:
+        _particle_specs.append(key[:2])
+        side = -(-side // PIXEL) * PIXEL
+        if len(color) == 4:
+            sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+        else:
+            sprite = pygame.Surface((side, side)).convert()
+        sprite.fill(color)
+        index = _particle_sprite_index[key] = len(_particle_sprites)
+        _particle_sprites.append(sprite)
+        _particle_max_side = max(_particle_max_side, side)
+    return index
+
+
+def _lowres_particle_sprites():
+    """Sprites del framebuffer, en el mismo orden que _particle_sprites."""
+    for color, side in _particle_specs[len(_particle_sprites_lowres):]:
+        side = -(-side // PIXEL)
+        if len(color) == 4:
+            sprite = pygame.Surface((side, side), pygame.SRCALPHA)
+        else:
+            sprite = pygame.Surface((side, side)).convert()
+        sprite.fill(color)
+        _particle_sprites_lowres.append(sprite)
+    return _particle_sprites_lowres
+
+
+def _emitter_sprites(name):
+    ids = _emitter_sprite_ids.get(name)
+    if ids is None:
+        ids = _emitter_sprite_ids[name] = [get_particle_sprite(c, s) for c, s in EMITTERS[name]["sprites"]]
+    return ids
+
+
+class ParticlePool:
+    """Partículas preasignadas por columnas; con NumPy la actualización es
+    vectorizada y sin NumPy se recorren listas del mismo tamaño fijo."""
+
+    COLUMNS = ("x", "y", "vx", "vy", "ay", "life", "sprite")
+
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.n = 0
+        self.capacity = capacity
+        if np is not None:
+            for name in self.COLUMNS:
+                setattr(self, name, np.zeros(capacity, np.int16 if name == "sprite" else np.float64))
+            self._tmp = np.zeros(capacity, np.float64)
+            self._tmp_sprite = np.zeros(capacity, np.int16)
+            self._alive = np.zeros(capacity, bool)
+            self._order = np.arange(capacity)
+            self._idx = np.zeros(capacity, self._order.dtype)
+        else:
+            for name in self.COLUMNS:
+                setattr(self, name, [0] * capacity)
+        self._bounds = pygame.Rect(0, 0, 0, 0)
+
+    def clear(self):
+        self.n = 0
+
+    def emit(self, name, count, x, y):
+        """Lanza 'count' partículas del emisor 'name' desde (x, y). 'count'
+        puede ser fraccionario y se escala con la calidad adaptativa; si el
+        almacén está lleno, las que no caben se descartan."""
+        spec = EMITTERS[name]
+        count *= quality["particulas"]
+        count = int(count) + (random.random() < count - int(count))
+        count = min(count, self.capacity - self.n)
+        if count <= 0:
+            return 0
+        sprites = _emitter_sprites(name)
+        aw, ah = spec["area"]
+        vx0, vy0 = spec["vel"]
+        jitter = spec["jitter"]
+        life_lo, life_hi = spec["vida"]
+        uniform = random.uniform
+        for i in range(self.n, self.n + count):
+            self.x[i] = x + uniform(0, aw)
+            self.y[i] = y + uniform(0, ah)
+            self.vx[i] = vx0 + uniform(-jitter, jitter)
+            self.vy[i] = vy0 + uniform(-jitter, jitter)
+            self.ay[i] = spec["ay"]
+            self.life[i] = uniform(life_lo, life_hi)
+            self.sprite[i] = random.choice(sprites)
+        self.n += count
+        return count
+
+    def update(self, dt):
+        """Avanza 'dt' ms y elimina las partículas que agotaron su vida."""
+        n = self.n
+        if not n:
+            return
+        if np is None:
+            x, y, vx, vy, ay, life = self.x, self.y, self.vx, self.vy, self.ay, self.life
+            i = 0
+            while i < n:
+                life[i] -= dt
+                if life[i] <= 0:
+                    # la última ocupa su lugar y se procesa en esta misma vuelta
+                    n -= 1
+                    for name in self.COLUMNS:
+                        col = getattr(self, name)
+                        col[i] = col[n]
+                    continue
+                vy[i] += ay[i] * dt
+                x[i] += vx[i] * dt
+                y[i] += vy[i] * dt
+                i += 1
+            self.n = n
+            return
+        tmp = self._tmp[:n]
+        np.multiply(self.ay[:n], dt, out=tmp)
+        self.vy[:n] += tmp
+        np.multiply(self.vx[:n], dt, out=tmp)
+        self.x[:n] += tmp
+        np.multiply(self.vy[:n], dt, out=tmp)
+        self.y[:n] += tmp
+        self.life[:n] -= dt
+        alive = self._alive[:n]
+        np.greater(self.life[:n], 0.0, out=alive)
+        kept = int(np.count_nonzero(alive))
+        if kept < n:
+            # índices de las vivas y, columna por columna, take al búfer de
+            # trabajo y copia de vuelta: sin arreglos temporales por columna
+            idx = self._idx[:kept]
+            np.compress(alive, self._order[:n], out=idx)
+            for name in self.COLUMNS:
+                col = getattr(self, name)
+                scratch = (self._tmp_sprite if name == "sprite" else self._tmp)[:kept]
+                np.take(col, idx, out=scratch, mode="clip")
+                col[:kept] = scratch
+        self.n = kept
+
+    def draw(self, surf):
+        """Dibuja todas las partículas con un solo blits. Devuelve el rectángulo
+        de pantalla que las contiene (None si no hay ninguna)."""
+        n = self.n
+        if not n:
+            return None
+        if np is None:
+            xs = [int(v) for v in self.x[:n]]
+            ys = [int(v) for v in self.y[:n]]
+            ids = self.sprite[:n]
+        else:
+            xs = self.x[:n].astype(np.int32).tolist()
+            ys = self.y[:n].astype(np.int32).tolist()
+            ids = self.sprite[:n].tolist()
+        s = art_scale
+        if s == 1:
+            sprites = _particle_sprites
+            dests = zip(xs, ys)
+        else:
+            sprites = _lowres_particle_sprites()
+            dests = [(x // s, y // s) for x, y in zip(xs, ys)]
+        blit_sprites(surf, zip([sprites[i] for i in ids], dests), False)
+        left, top = min(xs), min(ys)
+        self._bounds.update(left, top, max(xs) - left + _particle_max_side,
+                            max(ys) - top + _particle_max_side)
+        return self._bounds
+
+
+particles = ParticlePool()
+_near_miss_seen = deque(maxlen=16)
+_turbo_glow = {}
+
+
+def get_turbo_glow():
+    """Halo del turbo: se dibuja una sola vez en lugar de en cada cuadro."""
+    glow = _turbo_glow.get(art_scale)
+    if glow is None:
+        glow = _turbo_glow[art_scale] = pygame.Surface((art_size(CAR_W + 30), art_size(CAR_H + 30)),
+                                                       pygame.SRCALPHA)
+        pygame.draw.ellipse(glow, (100, 170, 255, 60), glow.get_rect())
+    return glow
+
+
+def update_race_effects(dt):
+    """Emisores de la carrera: una vez por cuadro con el tiempo real 'dt', no
+    por paso de simulación, porque no influyen en el resultado."""
+    if is_boosting:
+        particles.emit("turbo", TURBO_PER_MS * dt, player_x + 12, player_y + CAR_H)
+    if player_x != prev_player_x:
+        for wheel_x in (player_x + int(CAR_W * 0.2), player_x + int(CAR_W * 0.8)):
+            particles.emit("humo", SMOKE_PER_MS * dt, wheel_x - 3, player_y + int(CAR_H * 0.78))
+    # roces: obstáculos que pasan pegados al costado sin llegar a chocar
+    for row in broad_phase_candidates(player_x - NEAR_MISS_PX, player_y, CAR_W + 2 * NEAR_MISS_PX, CAR_H):
+        eid = int(entities.eid[row])
+        if eid in _near_miss_seen:
+            continue
+        _near_miss_seen.append(eid)
+        side_x = player_x if entities.x[row] < player_x else player_x + CAR_W
+        spark_y = min(max(int(entities.y[row]) + CAR_H // 2, player_y), player_y + CAR_H - 24)
+        particles.emit("chispas", SPARKS_PER_NEAR_MISS, side_x - 2, spark_y)
+    particles.update(dt)
 
 # -----------------------------
 # FUNCIONES EXISTENTES/CONSERVADAS
 # -----------------------------
 
-def center_text(surface, text, y, font, color=WHITE):
+# Caché de texto renderizado: rasterizar una fuente es caro y los textos del
+# menú y del HUD se repiten cuadro a cuadro. LRU por (fuente, texto, color).
+TEXT_CACHE_MAX = 256
+HUD_SEPARATOR = "   |   "
+_text_cache = OrderedDict()
+
+
+def render_text(font, text, color=WHITE):
+    """Devuelve la superficie del texto, renderizándola solo la primera vez."""
+    key = (font, text, tuple(color))
+    img = _text_cache.get(key)
+    if img is not None:
+        _text_cache.move_to_end(key)
+        return img
     img = font.render(text, True, color)
+    _text_cache[key] = img
+    if len(_text_cache) > TEXT_CACHE_MAX:
+        _text_cache.popitem(last=False)
+    return img
+
+
+def clear_text_cache():
+    _text_cache.clear()
+
+
+def center_text(surface, text, y, font, color=WHITE):
+    img = render_text(font, text, color)
     rect = img.get_rect(center=(WIDTH // 2, y))
-    surface.blit(img, rect)
+    return blit_sprites(surface, ((img, rect.topleft),))[0]
+
+
+def center_fields(surface, fields, y, font, color=WHITE, sep=HUD_SEPARATOR):
+    """Como center_text, pero cada campo se cachea por separado: cuando cambia
+    un valor (p. ej. el puntaje) solo se vuelve a renderizar ese campo."""
+    sep_img = render_text(font, sep, color)
+    imgs = [render_text(font, field, color) for field in fields]
+    total_w = sum(img.get_width() for img in imgs) + sep_img.get_width() * (len(imgs) - 1)
+    height = max(img.get_height() for img in imgs)
+    x = WIDTH // 2 - total_w // 2
+    top = y - height // 2
+    area = pygame.Rect(x, top, total_w, height)
+    seq = []
+    for i, img in enumerate(imgs):
+        if i:
+            seq.append((sep_img, (x, top)))
+            x += sep_img.get_width()
+        seq.append((img, (x, top)))
+        x += img.get_width()
+    blit_sprites(surface, seq, False)
+    return area
+
+
+# -----------------------------
+# GEOMETRÍA DE PISTA
+# -----------------------------
+# La línea central de cada nivel se precalcula una vez en tablas (centro, borde
+# izquierdo y carriles) muestreadas cada TRACK_TABLE_STEP unidades de distancia;
+# las consultas interpolan entre muestras y no evalúan trigonometría.
+# Un trazado es una lista de tramos (tipo, fracción de la vuelta, amplitud
+# relativa a "curve_amp"). Tipos:
+#   "seno"    la onda global de siempre: sin(dist / curve_wavelength)
+#   "recta"   mantiene el desplazamiento con que empieza el tramo
+#   "curva"   se abre hacia un lado y vuelve (media onda)
+#   "chicana" S rápida hacia un lado y el otro (onda completa)
+#   "peralte" curva de óvalo: entra, sostiene el desplazamiento y sale
+
+TRACK_TABLE_STEP = 4.0
+TRACK_TABLE_MARGIN = 400.0  # la distancia puede pasar un poco de la vuelta antes de reiniciarse
+
+TRACK_LAYOUTS = {
+    "clasico": [("seno", 1.0, 1.0)],
+    "ovalo": [("recta", 0.2, 0.0), ("peralte", 0.3, 1.0), ("recta", 0.2, 0.0), ("peralte", 0.3, -1.0)],
+    "chicanas": [("recta", 0.15, 0.0), ("chicana", 0.1, 0.7), ("curva", 0.25, -1.0),
+                 ("recta", 0.1, 0.0), ("chicana", 0.1, -0.7), ("curva", 0.3, 1.0)],
+}
+
+# NASCAR_CIRCUITO=<trazado> usa ese trazado en todos los niveles
+layout_override = os.environ.get("NASCAR_CIRCUITO") or None
+if layout_override is not None and layout_override not in TRACK_LAYOUTS:
+    print(f"Circuito desconocido '{layout_override}' (hay: {', '.join(TRACK_LAYOUTS)}): "
+          "se usa el de cada nivel")
+    layout_override = None
+
+track_center_table = None
+track_left_table = None
+track_lanes_table = None
+_track_last = (None, None)
+
+
+def _segment_offset(kind, t, start, amp, dist):
+    if kind == "seno":
+        return math.sin(dist / curve_wavelength) * amp
+    if kind == "curva":
+        return start + amp * math.sin(math.pi * t)
+    if kind == "chicana":
+        return start + amp * math.sin(2 * math.pi * t)
+    if kind == "peralte":
+        ramp = min(1.0, t / 0.25, (1.0 - t) / 0.25)
+        return start + amp * (3 * ramp * ramp - 2 * ramp * ramp * ramp)
+    return start  # recta
+
+
+def layout_offset_function(layout, length, amplitude):
+    """Convierte un trazado en una función distancia -> desplazamiento lateral."""
+    segments = []
+    pos = 0.0
+    total = sum(frac for _, frac, _ in layout) or 1.0
+    for kind, frac, rel_amp in layout:
+        seg_len = length * frac / total
+        segments.append((pos, seg_len, kind, rel_amp * amplitude))
+        pos += seg_len
+
+    # desplazamiento con que termina cada tramo = con el que empieza el siguiente
+    starts = []
+    offset = 0.0
+    for seg_start, seg_len, kind, amp in segments:
+        starts.append(offset)
+        offset = _segment_offset(kind, 1.0, offset, amp, seg_start + seg_len)
+
+    def offset_at(dist):
+        d = dist % length
+        for (seg_start, seg_len, kind, amp), start in zip(segments, starts):
+            if d < seg_start + seg_len or seg_start + seg_len >= length:
+                t = (d - seg_start) / seg_len if seg_len else 0.0
+                return _segment_offset(kind, t, start, amp, dist)
+        return 0.0
+
+    return offset_at
+
+
+def build_track(layout, length, amplitude):
+    """Precalcula las tablas de centro, borde izquierdo y carriles de la pista."""
+    global track_center_table, track_left_table, track_lanes_table, _track_last
+    offset_at = layout_offset_function(layout, length, amplitude)
+    samples = int((length + TRACK_TABLE_MARGIN) / TRACK_TABLE_STEP) + 2
+    track_center_table = [WIDTH // 2 + offset_at(i * TRACK_TABLE_STEP) for i in range(samples)]
+    track_left_table = [int(c) - ROAD_WIDTH // 2 for c in track_center_table]
+    track_lanes_table = [[left + off for off in LANE_OFFSETS] for left in track_left_table]
+    _track_last = (None, None)
+
+
+def _track_lookup(dist):
+    """(centro, borde izquierdo, carriles) en 'dist'. En un mismo cuadro se
+    consulta muchas veces la misma distancia: se recuerda la última respuesta."""
+    global _track_last
+    if _track_last[0] == dist:
+        return _track_last[1]
+    table = track_center_table
+    if table is None:
+        center_x = WIDTH // 2 + int(math.sin(dist / curve_wavelength) * curve_amplitude)
+        left_x = center_x - ROAD_WIDTH // 2
+        lanes = [left_x + off for off in LANE_OFFSETS]
+    else:
+        f = dist / TRACK_TABLE_STEP
+        i = int(f)
+        if i + 1 >= len(table) or i < 0:
+            # fuera de la tabla: se repite la vuelta
+            f = (dist % lap_distance) / TRACK_TABLE_STEP
+            i = int(f)
+        c0 = table[i]
+        center_x = int(c0 + (table[i + 1] - c0) * (f - i))
+        left_x = center_x - ROAD_WIDTH // 2
+        # la muestra más cercana suele coincidir: se reutilizan sus carriles precalculados
+        j = i + 1 if f - i >= 0.5 else i
+        lanes = track_lanes_table[j] if track_left_table[j] == left_x else [left_x + off for off in LANE_OFFSETS]
+    result = (center_x, left_x, lanes)
+    _track_last = (dist, result)
+    return result
 
 
 def get_road_center_x(dist):
-    return WIDTH // 2 + int(math.sin(dist / curve_wavelength) * curve_amplitude)
+    return _track_lookup(dist)[0]
 
 
 def compute_lane_positions(dist):
-    center_x = get_road_center_x(dist)
-    left_x = center_x - ROAD_WIDTH // 2
-    return [left_x + off for off in LANE_OFFSETS], left_x, center_x
+    center_x, left_x, lanes = _track_lookup(dist)
+    return lanes, left_x, center_x
+
+# -----------------------------
+# PAISAJE POR TRAMOS
+# -----------------------------
+# La carretera recorrida (road_scroll) se divide en tramos de SCENERY_CHUNK
+# píxeles. Cada tramo se puebla con muestreo Poisson-disk: dardos al azar sobre
+# una grilla de celdas, aceptados solo si no hay otro objeto a menos de su
+# separación mínima (así nunca se encima nada; si un dardo no cabe se descarta).
+# Un punto es (posición w a lo largo de la carretera, lado, distancia d al
+# borde de la carretera); la x en pantalla se calcula al aparecer, con la curva
+# de ese momento. El azar de cada tramo sale de su índice y del trazado: en un
+# mismo circuito el paisaje es el mismo a igual distancia desplazada. No sigue
+# la vuelta: la segunda trae tramos nuevos y, como road_scroll depende de la
+# velocidad, un punto de la pista (track_distance) no tiene paisaje fijo.
+# Los tramos se construyen por adelantado y de a poco (SCENERY_DARTS_PER_STEP
+# dardos por paso), así que el costo por paso es constante.
+# Con NASCAR_PAISAJE_HILO=1 (o F8 en carrera) los construye un hilo aparte y
+# los deja terminados en una cola acotada: el paso solo adopta los listos. Como
+# cada tramo depende solo de su índice y del anterior, da igual quién lo
+# construya: la simulación no cambia. Si el hilo se atrasa, el paso completa
+# el tramo que la carretera ya alcanzó, como sin hilo.
+
+SCENERY_CHUNK = 480
+SCENERY_SIDE_DEPTH = 180          # ancho de la franja muestreada a cada lado
+SCENERY_CELL = 60                 # lado de las celdas de la grilla
+SCENERY_ATTEMPTS = 30             # dardos por objeto antes de renunciar a él
+SCENERY_DARTS_PER_STEP = 6
+SCENERY_CHUNKS_AHEAD = 2
+SCENERY_QUEUE_MAX = 4             # tramos terminados que el hilo deja esperando
+SCENERY_SIDES = ("L", "R")
+SCENERY_SPACING = {KIND_TREE: TREE_MIN_SPACING, KIND_LAMP: LAMP_MIN_SPACING}
+SCENERY_SIZE = {KIND_TREE: (24, 64), KIND_LAMP: (10, 100)}
+SCENERY_TOP = {KIND_TREE: -60, KIND_LAMP: -120}   # y al aparecer
+# celdas vecinas a revisar por tipo: cubre la mayor separación que le aplica
+SCENERY_REACH = {kind: math.ceil(max(r, SCENERY_CROSS_SPACING) / SCENERY_CELL)
+                 for kind, r in SCENERY_SPACING.items()}
+SCENERY_MAX_SPACING = max(max(SCENERY_SPACING.values()), SCENERY_CROSS_SPACING)
+
+
+class SceneryChunk:
+    """Un tramo en construcción. 'carry' son los puntos del tramo anterior
+    cerca del borde (con w negativa): cuentan para la separación pero no se
+    vuelven a sembrar. Los puntos son (w, tipo, lado, d, u): 'u' en [0, 1)
+    decide si el punto aparece con la densidad de la calidad adaptativa."""
+
+    def __init__(self, index, seed, carry=()):
+        self.index = index
+        self.rng = RngStream(seed)
+        self.carried = tuple(carry)
+        self.points = []
+        self.grid = {}
+        self.plan = [KIND_LAMP] * LAMPS_PER_CHUNK + [KIND_TREE] * TREES_PER_CHUNK
+        self.attempts = 0
+        for point in carry:
+            self._insert(point)
+
+    @property
+    def done(self):
+        return not self.plan
+
+    def _insert(self, point):
+        w, kind, side, d, _ = point
+        key = (side, int(d // SCENERY_CELL), int(w // SCENERY_CELL))
+        self.grid.setdefault(key, []).append((d, w, kind))
+
+    def _fits(self, kind, side, d, w):
+        reach = SCENERY_REACH[kind]
+        cx, cy = int(d // SCENERY_CELL), int(w // SCENERY_CELL)
+        own = SCENERY_SPACING[kind]
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for od, ow, okind in self.grid.get((side, gx, gy), ()):
+                    r = own if okind == kind else SCENERY_CROSS_SPACING
+                    if (od - d) ** 2 + (ow - w) ** 2 < r * r:
+                        return False
+        return True
+
+    def work(self, darts):
+        """Lanza hasta 'darts' dardos. Devuelve True si el tramo quedó completo."""
+        rng = self.rng
+        while darts > 0 and self.plan:
+            darts -= 1
+            kind = self.plan[-1]
+            side = SCENERY_SIDES[rng.getrandbits(1)]
+            d = rng.random() * SCENERY_SIDE_DEPTH
+            w = rng.random() * SCENERY_CHUNK
+            self.attempts += 1
+            if self._fits(kind, side, d, w):
+                point = (w, kind, side, d, rng.random())
+                self.points.append(point)
+                self._insert(point)
+            elif self.attempts < SCENERY_ATTEMPTS:
+                continue
+            # objeto colocado, o sin lugar tras SCENERY_ATTEMPTS dardos: el siguiente
+            self.plan.pop()
+            self.attempts = 0
+        return not self.plan
+
+    def carry(self):
+        """Puntos cerca del final, vistos desde el tramo siguiente."""
+        edge = SCENERY_CHUNK - SCENERY_MAX_SPACING
+        return [(p[0] - SCENERY_CHUNK,) + p[1:] for p in self.points if p[0] >= edge]
+
+
+_scenery_seed = 0
+_scenery_builder = None
+_scenery_pending = deque()   # (w absoluta, tipo, lado, d, u) ordenados por w
+
+scenery_thread_enabled = bool(os.environ.get("NASCAR_PAISAJE_HILO"))
+_scenery_ready = queue.Queue(SCENERY_QUEUE_MAX)   # (generación, índice, puntos, carry)
+_scenery_generation = 0   # cambia al reiniciar el hilo: lo que traía queda viejo
+
+
+def scenery_chunk_seed(index, seed=None):
+    return ((_scenery_seed if seed is None else seed) << 32) ^ (index & 0xFFFFFFFF)
+
+
+def _scenery_worker(generation, seed, index, carry):
+    """Construye tramos seguidos desde 'index' hasta que lo reinicien. Con la
+    cola llena espera: nunca se adelanta más de SCENERY_QUEUE_MAX tramos."""
+    while generation == _scenery_generation:
+        chunk = SceneryChunk(index, scenery_chunk_seed(index, seed), carry)
+        # de a poco, soltando el GIL entre tandas: si no, el hilo principal
+        # puede quedar esperándolo un intervalo de cambio entero (5 ms)
+        while not chunk.work(SCENERY_DARTS_PER_STEP):
+            time.sleep(0)
+        carry = chunk.carry()
+        item = (generation, index, chunk.points, carry)
+        while generation == _scenery_generation:
+            try:
+                _scenery_ready.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        index += 1
+
+
+def restart_scenery_worker():
+    """Descarta lo que el hilo tenía hecho y, si está activo, lo relanza desde
+    el tramo en construcción."""
+    global _scenery_generation
+    _scenery_generation += 1
+    while True:
+        try:
+            _scenery_ready.get_nowait()
+        except queue.Empty:
+            break
+    if scenery_thread_enabled and _scenery_builder is not None:
+        b = _scenery_builder
+        threading.Thread(target=_scenery_worker, name="paisaje", daemon=True,
+                         args=(_scenery_generation, _scenery_seed, b.index, b.carried)).start()
+
+
+def toggle_scenery_thread():
+    global scenery_thread_enabled
+    scenery_thread_enabled = not scenery_thread_enabled
+    restart_scenery_worker()
+
+
+def reset_scenery(layout_name, first_w):
+    """Empieza el paisaje de una carrera en el tramo que contiene 'first_w'."""
+    global _scenery_seed, _scenery_builder
+    _scenery_seed = zlib.crc32(layout_name.encode("utf-8"))
+    index = math.floor(first_w / SCENERY_CHUNK)
+    _scenery_builder = SceneryChunk(index, scenery_chunk_seed(index))
+    _scenery_pending.clear()
+    restart_scenery_worker()
+
+
+def _adopt_scenery_chunk(index, points, carry):
+    global _scenery_builder
+    base = index * SCENERY_CHUNK
+    _scenery_pending.extend(sorted((base + p[0],) + p[1:] for p in points))
+    _scenery_builder = SceneryChunk(index + 1, scenery_chunk_seed(index + 1), carry)
+
+
+def _finish_scenery_chunk():
+    chunk = _scenery_builder
+    _adopt_scenery_chunk(chunk.index, chunk.points, chunk.carry())
+
+
+def _take_ready_scenery():
+    """Adopta el tramo en construcción si el hilo ya lo terminó. Los que el
+    paso completó por su cuenta mientras tanto llegan repetidos y se descartan.
+    Devuelve True si adoptó uno."""
+    while True:
+        try:
+            generation, index, points, carry = _scenery_ready.get_nowait()
+        except queue.Empty:
+            return False
+        if generation == _scenery_generation and index == _scenery_builder.index:
+            _adopt_scenery_chunk(index, points, carry)
+            return True
+
+
+def build_scenery(scroll, darts=SCENERY_DARTS_PER_STEP):
+    """Avanza la construcción de los tramos próximos. Si la carretera alcanzó
+    un tramo todavía sin terminar, lo completa de una vez. Con el hilo de
+    paisaje solo adopta lo que el hilo dejó listo (y completa lo urgente)."""
+    limit = scroll + SCENERY_CHUNKS_AHEAD * SCENERY_CHUNK
+    while _scenery_builder.index * SCENERY_CHUNK <= limit:
+        if scenery_thread_enabled:
+            if _take_ready_scenery():
+                continue
+            darts = 0
+        if _scenery_builder.index * SCENERY_CHUNK <= scroll:
+            darts = max(darts, len(_scenery_builder.plan) * SCENERY_ATTEMPTS)
+        if darts <= 0 or not _scenery_builder.work(darts):
+            break
+        darts = 0
+        _finish_scenery_chunk()
+
+
+def spawn_scenery(scroll, road_left_x):
+    """Hace aparecer los objetos cuya posición w ya alcanzó la carretera."""
+    density = quality["densidad"]
+    while _scenery_pending and _scenery_pending[0][0] <= scroll:
+        w, kind, side, d, u = _scenery_pending.popleft()
+        y = SCENERY_TOP[kind] + int(scroll - w)
+        if u >= density or y > HEIGHT:
+            continue
+        if side == "L":
+            x = road_left_x - 40 - int(d)
+            visible = x >= 30
+        else:
+            x = road_left_x + ROAD_WIDTH + 20 + int(d)
+            visible = x <= WIDTH - 60
+        if visible:
+            entities.spawn(kind, x, y, *SCENERY_SIZE[kind])
+
+
+def update_scenery(scroll, road_left_x):
+    build_scenery(scroll)
+    spawn_scenery(scroll, road_left_x)
+
+
+def scenery_snapshot():
+    """Tramo en construcción y objetos por aparecer (para rebobinar)."""
+    b = _scenery_builder
+    return (b.index, b.rng.getstate(), b.carried, tuple(b.points), len(b.plan), b.attempts,
+            tuple(_scenery_pending))
+
+
+def restore_scenery(state):
+    global _scenery_builder
+    index, rng_state, carried, points, plan_left, attempts, pending = state
+    builder = SceneryChunk(index, 0, carried)
+    builder.rng.setstate(rng_state)
+    for point in points:
+        builder.points.append(point)
+        builder._insert(point)
+    # el plan se consume desde el final: lo que queda es siempre su comienzo
+    del builder.plan[plan_left:]
+    builder.attempts = attempts
+    _scenery_builder = builder
+    _scenery_pending.clear()
+    _scenery_pending.extend(pending)
+    restart_scenery_worker()
 
 # Reemplazo de funciones de dibujo anteriores por nuevas versiones pixel
 
 def spawn_obstacle_using_current_lanes():
     lanes, _, _ = compute_lane_positions(track_distance)
-    lane_x = random.choice(lanes)
-    rect = pygame.Rect(lane_x, -CAR_H, CAR_W, CAR_H)
-    obstacles.append(rect)
+    lane = rng_obstacles.randrange(len(lanes))
+    eid = entities.spawn(KIND_OBSTACLE, lanes[lane], -CAR_H, CAR_W, CAR_H, lane)
+    lane_buckets[lane].append(eid)
+
+# -----------------------------
+# PRESENTACIÓN (RECTÁNGULOS SUCIOS)
+# -----------------------------
+# Modo opcional (NASCAR_DIRTY_RECTS=1 o F4 en carrera): cada capa anota las
+# zonas que dibujó y el cuadro se presenta con pygame.display.update(rects),
+# sumando las zonas del cuadro anterior para borrar lo que se movió. En carrera
+# la tira de la carretera es una zona más (avanza en cada cuadro; si se curva,
+# la zona del cuadro anterior borra la posición vieja). Si el fondo cambia (la
+# oscuridad del nivel) se presenta la pantalla entera.
+
+DIRTY_LAYERS = ("escenario", "carros", "hud", "elogio")
+dirty_rects_enabled = bool(os.environ.get("NASCAR_DIRTY_RECTS"))
+_dirty_now = {layer: [] for layer in DIRTY_LAYERS}
+_dirty_prev = []
+_dirty_background = None
+
+
+def mark_dirty(layer, rect):
+    """Anota una zona cambiada en la capa indicada (solo en modo sucio)."""
+    if dirty_rects_enabled and rect:
+        _dirty_now[layer].append(pygame.Rect(rect))
+
+
+DIRTY_COALESCE_BIG = 4   # zonas grandes contra las que se prueba cada una
+
+
+def coalesce_rects(rects):
+    """Evita copiar dos veces lo mismo: descarta las zonas que caen dentro de
+    alguna de las más grandes (en carrera, la tira de la carretera de este
+    cuadro y la del anterior tapan casi todo el tráfico)."""
+    kept = []
+    for r in sorted(rects, key=lambda r: r.w * r.h, reverse=True):
+        if not any(k.contains(r) for k in kept[:DIRTY_COALESCE_BIG]):
+            kept.append(r)
+    return kept
+
+
+def present_frame(background=None):
+    """Presenta el cuadro. 'background' identifica el fondo dibujado: si es el
+    mismo que en el cuadro anterior solo se copian las zonas sucias."""
+    global _dirty_prev, _dirty_background
+    if gpu is not None:
+        # el Renderer recompone el cuadro entero: las zonas sucias no aplican
+        for layer in DIRTY_LAYERS:
+            _dirty_now[layer].clear()
+        gpu.present()
+        return
+    if not dirty_rects_enabled:
+        pygame.display.flip()
+        return
+    current = []
+    for layer in DIRTY_LAYERS:
+        current.extend(_dirty_now[layer])
+        _dirty_now[layer].clear()
+    if background is None or background != _dirty_background:
+        pygame.display.flip()
+    elif current or _dirty_prev:
+        rects = coalesce_rects(_dirty_prev + current)
+        # si las zonas suman más que la pantalla, copiarla entera es más barato
+        if sum(r.w * r.h for r in rects) >= WIDTH * HEIGHT:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+    _dirty_prev = current
+    _dirty_background = background
+
+
+def invalidate_frame():
+    """Obliga a presentar la pantalla completa en el próximo cuadro."""
+    global _dirty_background
+    _dirty_background = None
+
+
+def toggle_dirty_rects():
+    global dirty_rects_enabled
+    dirty_rects_enabled = not dirty_rects_enabled
+    invalidate_frame()
+
+
+def is_expose_event(e):
+    """La ventana quedó descubierta o cambió de tamaño: hay que redibujar todo."""
+    return e.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED,
+                      pygame.WINDOWSIZECHANGED)
+
+
+def is_quit_event(e):
+    """Cerrar la ventana. Con el renderizador de texturas la ventana oculta de
+    set_mode sigue abierta, así que SDL no manda QUIT al cerrar la visible."""
+    return e.type == pygame.QUIT or e.type == pygame.WINDOWCLOSE
+
 
 # -----------------------------
 # MENÚ / SELECCIÓN NIVEL
 # -----------------------------
 
-def selection_screen():
+# Parámetros de cada nivel (también los usan las herramientas de benchmark)
+LEVEL_PRESETS = {
+    "FÁCIL": {
+        "spawn_ms": 1400,
+        "obstacle_speed": 8,
+        "rival_base": 0.25,
+        "visibility": 30,
+        "score_base": 12,
+        "rival_multiplier": 0.8,
+        "curve_amp": 100,
+        "lap_distance": 1600,
+        "laps_total": 3,
+        "rivals": 20
+    },
+    "MEDIO": {
+        "spawn_ms": 1000,
+        "obstacle_speed": 10,
+        "rival_base": 0.4,
+        "visibility": 60,
+        "score_base": 15,
+        "rival_multiplier": 1.0,
+        "curve_amp": 160,
+        "lap_distance": 2000,
+        "laps_total": 3,
+        "rivals": 30
+    },
+    "EXTREMO": {
+        "spawn_ms": 800,
+        "obstacle_speed": 13,
+        "rival_base": 0.6,
+        "visibility": 110,
+        "score_base": 18,
+        "rival_multiplier": 1.25,
+        "curve_amp": 220,
+        "lap_distance": 2400,
+        "laps_total": 4,
+        "rivals": 40
+    },
+}
+LEVEL_KEYS = {pygame.K_1: "FÁCIL", pygame.K_2: "MEDIO", pygame.K_3: "EXTREMO"}
+
+
+def apply_level(name, overrides=None):
+    """Carga los parámetros del nivel; 'overrides' permite reajustarlos
+    (por ejemplo, al re-simular carreras grabadas)."""
     global level_params, level_name, laps_total, lap_distance
-    while True:
-        screen.fill(BLACK)
-        center_text(screen, "Objetivo: NO CHOQUES!!", HEIGHT // 2 - 70, small_font, WHITE)
-        center_text(screen, "NASCAR - Selección de nivel", HEIGHT // 2 - 120, title_font, YELLOW)
-        center_text(screen, "Elige un nivel: 1 - FÁCIL | 2 - MEDIO | 3 - EXTREMO", HEIGHT // 2 - 35, menu_font, WHITE)
-        center_text(screen, "Controles: ← → mover | Shift TURBO | Espacio reiniciar | 0 salir", HEIGHT // 2 + 50, hud_font, LIGHT_GRAY)
-        center_text(screen, "Presiona 1/2/3 para seleccionar", HEIGHT // 2 + 70, small_font, ORANGE)
-        pygame.display.flip()
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if e.type == pygame.KEYDOWN:
-                if e.key == pygame.K_1:
-                    level_name = "FÁCIL"
-                    level_params = {
-                        "spawn_ms": 1400,
-                        "obstacle_speed": 8,
-                        "rival_base": 0.25,
-                        "visibility": 30,
-                        "score_base": 12,
-                        "rival_multiplier": 0.8,
-                        "curve_amp": 100,
-                        "lap_distance": 1600,
-                        "laps_total": 3
-                    }
-                    pygame.time.set_timer(SPAWN_OBSTACLE_EVENT, level_params["spawn_ms"])
-                    laps_total = level_params["laps_total"]
-                    lap_distance = level_params["lap_distance"]
-                    return
-                if e.key == pygame.K_2:
-                    level_name = "MEDIO"
-                    level_params = {
-                        "spawn_ms": 1000,
-                        "obstacle_speed": 10,
-                        "rival_base": 0.4,
-                        "visibility": 60,
-                        "score_base": 15,
-                        "rival_multiplier": 1.0,
-                        "curve_amp": 160,
-                        "lap_distance": 2000,
-                        "laps_total": 3
-                    }
-                    pygame.time.set_timer(SPAWN_OBSTACLE_EVENT, level_params["spawn_ms"])
-                    laps_total = level_params["laps_total"]
-                    lap_distance = level_params["lap_distance"]
-                    return
-                if e.key == pygame.K_3:
-                    level_name = "EXTREMO"
-                    level_params = {
-                        "spawn_ms": 800,
-                        "obstacle_speed": 13,
-                        "rival_base": 0.6,
-                        "visibility": 110,
-                        "score_base": 18,
-                        "rival_multiplier": 1.25,
-                        "curve_amp": 220,
-                        "lap_distance": 2400,
-                        "laps_total": 4
-                    }
-                    pygame.time.set_timer(SPAWN_OBSTACLE_EVENT, level_params["spawn_ms"])
-                    laps_total = level_params["laps_total"]
-                    lap_distance = level_params["lap_distance"]
-                    return
-                if e.key == pygame.K_0:
-                    pygame.quit()
-                    sys.exit()
+    level_name = name
+    level_params = dict(LEVEL_PRESETS[name])
+    if overrides:
+        level_params.update(overrides)
+    laps_total = level_params["laps_total"]
+    lap_distance = level_params["lap_distance"]
+
+
+def draw_selection_screen():
+    clear_scene(screen, BLACK)
+    center_text(screen, "Objetivo: NO CHOQUES!!", HEIGHT // 2 - 70, small_font, WHITE)
+    center_text(screen, "NASCAR - Selección de nivel", HEIGHT // 2 - 120, title_font, YELLOW)
+    center_text(screen, "Elige un nivel: 1 - FÁCIL | 2 - MEDIO | 3 - EXTREMO", HEIGHT // 2 - 35, menu_font, WHITE)
+    center_text(screen, "Controles: ← → mover | Shift TURBO | Espacio reiniciar | 0 salir", HEIGHT // 2 + 50, hud_font, LIGHT_GRAY)
+    center_text(screen, "Presiona 1/2/3 para seleccionar", HEIGHT // 2 + 70, small_font, ORANGE)
 
 # -----------------------------
 # PANTALLA GAME OVER / CELEBRACION
 # -----------------------------
 
-def show_game_over():
-    global finish_visible, finish_traveled, celebrating
-    while True:
-        screen.fill(BLACK)
-        center_text(screen, "FIN DE LA CARRERA", HEIGHT // 2 - 120, title_font, RED)
-        center_text(screen, f"Nivel: {level_name}", HEIGHT // 2 - 40, menu_font, WHITE)
-        center_text(screen, f"Puntaje: {score}", HEIGHT // 2 - 10, hud_font, WHITE)
-        center_text(screen, f"Tu progreso: {int(player_progress)}  |  Rival: {int(rival_progress)}", HEIGHT // 2 + 20, small_font, LIGHT_GRAY)
-        center_text(screen, f"Vueltas completadas: {lap_count}/{laps_total}", HEIGHT // 2 + 50, small_font, ORANGE)
-        if player_progress > rival_progress:
-            center_text(screen, "¡Ganaste la carrera!", HEIGHT // 2 + 90, menu_font, GREEN)
-        else:
-            center_text(screen, "¡Perdiste la carrera!", HEIGHT // 2 + 90, menu_font, ORANGE)
-        center_text(screen, "Presiona ESPACIO para volver a jugar  |  Presiona 0 para salir", HEIGHT // 2 + 140, small_font, WHITE)
-        pygame.display.flip()
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE]:
-            reset_game()
-            return
-        if keys[pygame.K_0]:
-            pygame.quit(); sys.exit()
-
-
-def celebration_animation():
-    global celebrating, celebration_start
-    celebrating = True
-    celebration_start = pygame.time.get_ticks()
-    if cheer_sound:
-        cheer_sound.play()
+def draw_game_over():
+    clear_scene(screen, BLACK)
+    center_text(screen, "FIN DE LA CARRERA", HEIGHT // 2 - 120, title_font, RED)
+    center_text(screen, f"Nivel: {level_name}", HEIGHT // 2 - 40, menu_font, WHITE)
+    center_text(screen, f"Puntaje: {score}", HEIGHT // 2 - 10, hud_font, WHITE)
+    position, field = race_position()
+    center_text(screen, f"Posición: {position}/{field}  |  Tu progreso: {int(player_progress)}  |  Líder rival: {int(rival_progress)}",
+                HEIGHT // 2 + 20, small_font, LIGHT_GRAY)
+    center_text(screen, f"Vueltas completadas: {lap_count}/{laps_total}", HEIGHT // 2 + 50, small_font, ORANGE)
+    if player_progress > rival_progress:
+        center_text(screen, "¡Ganaste la carrera!", HEIGHT // 2 + 90, menu_font, GREEN)
+    else:
+        center_text(screen, "¡Perdiste la carrera!", HEIGHT // 2 + 90, menu_font, ORANGE)
+    center_text(screen, "Presiona ESPACIO para volver a jugar  |  Presiona 0 para salir", HEIGHT // 2 + 140, small_font, WHITE)
+
+
+def draw_celebration_frame(dt=SIM_DT_MS):
+    """Un cuadro de la animación de campeón: trofeo, conductor y confeti.
+    'dt' son los ms transcurridos desde el cuadro anterior."""
+    begin_scene()
+    clear_scene(canvas, BLACK)
+    # trofeo pixel
+    trophy_x = WIDTH // 2 - 40
+    trophy_y = 140
+    pixel_rect(canvas, trophy_x + 10, trophy_y + 70, 60, 20, GOLD)
+    pixel_rect(canvas, trophy_x + 25, trophy_y + 20, 30, 50, GOLD)
+    pygame.draw.circle(canvas, GOLD, art_point(trophy_x + 40, trophy_y + 20), art_size(14))
+    # conductor con copa (pixel)
+    driver_x, driver_y = WIDTH // 2 - 140, 280
+    pixel_rect(canvas, driver_x, driver_y, 50, 80, BLUE)
+    pygame.draw.circle(canvas, (255, 220, 170), art_point(driver_x + 25, driver_y - 10), art_size(18))
+    mark_layer((trophy_x + 8, trophy_y + 3, 64, 90))
+    mark_layer((driver_x - 2, driver_y - 30, 56, 114))
+    # confeti: es lo único que cambia entre cuadros
+    particles.emit("confeti", CONFETTI_PER_FRAME, WIDTH // 2 - 100, 350)
+    particles.update(dt)
+    mark_dirty("escenario", particles.draw(canvas))
+    end_scene()
+    center_text(screen, "¡CAMPEÓN!", 70, title_font, GOLD)
+    center_text(screen, "¡FELICITACIONES!", HEIGHT - 80, small_font, WHITE)
 
-    anim_duration = 3500
-    start = pygame.time.get_ticks()
-    while pygame.time.get_ticks() - start < anim_duration:
-        dt = clock.tick(60)
-        screen.fill(BLACK)
-        center_text(screen, "¡CAMPEÓN!", 70, title_font, GOLD)
-        # trofeo pixel
-        trophy_x = WIDTH // 2 - 40
-        trophy_y = 140
-        pixel_rect(screen, trophy_x + 10, trophy_y + 70, 60, 20, GOLD)
-        pixel_rect(screen, trophy_x + 25, trophy_y + 20, 30, 50, GOLD)
-        pygame.draw.circle(screen, GOLD, (trophy_x + 40, trophy_y + 20), 14)
-        # conductor con copa (pixel)
-        driver_x, driver_y = WIDTH // 2 - 140, 280
-        pixel_rect(screen, driver_x, driver_y, 50, 80, BLUE)
-        pygame.draw.circle(screen, (255, 220, 170), (driver_x + 25, driver_y - 10), 18)
-        # confeti
-        for i in range(20):
-            px = WIDTH // 2 - 100 + random.randint(0, 200)
-            py = 350 + random.randint(0, 140)
-            if random.random() < 0.5:
-                pixel_rect(screen, px, py, 4, 4, (255, 255, 200))
-            else:
-                pixel_rect(screen, px, py, 3, 3, (random.randint(0,255), random.randint(0,255), random.randint(0,255)))
-        center_text(screen, "¡FELICITACIONES!", HEIGHT - 80, small_font, WHITE)
-        pygame.display.flip()
-        for e in pygame.event.get():
-            if e.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-    celebrating = False
 
 # -----------------------------
 # RESET / INICIO PARTIDA
 # -----------------------------
 
 def reset_game():
-    global player_x, player_y, obstacles, trees, lamps
+    global player_x, player_y
     global player_progress, rival_progress, score, is_boosting
     global finish_line_y, finish_visible, finish_traveled, celebrating
-    global track_distance, lap_count
+    global track_distance, lap_count, road_scroll
     player_x = WIDTH // 2 - CAR_W // 2
-    obstacles = []
-    trees = []
-    lamps = []
+    entities.clear()
+    reset_collisions()
+    particles.clear()
+    rival_field.clear()
     player_progress = 0.0
     rival_progress = 0.0
     score = 0
@@ -457,215 +2373,1193 @@ def reset_game():
     finish_traveled = False
     celebrating = False
     track_distance = 0.0
+    road_scroll = 0.0
     lap_count = 0
 
+# -----------------------------
+# PERFILADOR DE CUADROS
+# -----------------------------
+# Se activa con F3 durante la carrera o con NASCAR_PROFILER=1. Cada fase del
+# bucle suma su tiempo con prof_mark(); por cuadro se guarda una fila en un
+# búfer circular (para el gráfico en pantalla) y en un CSV en disco.
+
+PROFILER_PHASES = ("eventos", "entrada", "paisaje", "obstaculos", "reglas",
+                   "carretera", "faroles", "arboles", "meta", "trafico", "rival",
+                   "turbo", "escalado", "hud", "particulas", "perfil", "flip")
+PROFILER_WINDOW = 120
+PROFILER_CSV = os.environ.get("NASCAR_PROFILER_CSV", "nascar_profile.csv")
+PROFILER_COLORS = ((90, 160, 255), (120, 220, 255), (60, 200, 90), (230, 80, 60),
+                   (200, 200, 90), (150, 150, 150), (255, 230, 120), (30, 140, 50),
+                   (240, 240, 240), (255, 120, 120), (255, 165, 0), (100, 170, 255),
+                   (90, 90, 200), (200, 120, 255), (255, 200, 40), (120, 120, 120),
+                   (255, 60, 160))
+
+profiler_enabled = bool(os.environ.get("NASCAR_PROFILER"))
+profiler_history = deque(maxlen=PROFILER_WINDOW)
+_profiler_panel = None
+_prof_frame = dict.fromkeys(PROFILER_PHASES, 0.0)
+_prof_t = 0.0
+_prof_frame_index = 0
+_prof_csv = None
+
+
+def prof_begin_frame():
+    global _prof_t
+    if not profiler_enabled:
+        return
+    for phase in _prof_frame:
+        _prof_frame[phase] = 0.0
+    _prof_t = time.perf_counter()
+
+
+def prof_mark(phase):
+    """Atribuye a 'phase' el tiempo transcurrido desde la marca anterior."""
+    global _prof_t
+    if not profiler_enabled:
+        return
+    t = time.perf_counter()
+    _prof_frame[phase] += (t - _prof_t) * 1000.0
+    _prof_t = t
+
+
+def prof_end_frame():
+    global _prof_frame_index, _prof_csv
+    if not profiler_enabled:
+        return
+    row = tuple(_prof_frame[p] for p in PROFILER_PHASES)
+    profiler_history.append(row)
+    _prof_frame_index += 1
+    if _prof_csv is None:
+        try:
+            _prof_csv = open(PROFILER_CSV, "w", encoding="utf-8")
+            _prof_csv.write("cuadro," + ",".join(PROFILER_PHASES) + ",total_ms\n")
+        except OSError:
+            _prof_csv = False  # sin disco escribible: solo el gráfico en pantalla
+    if _prof_csv:
+        _prof_csv.write(f"{_prof_frame_index}," + ",".join(f"{v:.3f}" for v in row)
+                        + f",{sum(row):.3f}\n")
+
+
+def prof_flush():
+    if _prof_csv:
+        _prof_csv.flush()
+
+
+def toggle_profiler():
+    global profiler_enabled
+    profiler_enabled = not profiler_enabled
+    if not profiler_enabled:
+        prof_flush()
+
+
+def draw_profiler_overlay(surf):
+    """Gráfico compacto: promedio por fase y tiempo total de los últimos cuadros."""
+    if not profiler_enabled or not profiler_history:
+        return
+    global _profiler_panel
+    frames = len(profiler_history)
+    avgs = [sum(col) / frames for col in zip(*profiler_history)]
+    panel = pygame.Rect(4, 66, 232, len(PROFILER_PHASES) * 12 + 58)
+    # se dibuja en su propia superficie (coordenadas relativas al panel) y se
+    # copia de una vez, así también queda encima con el renderizador de texturas
+    if _profiler_panel is None:
+        _profiler_panel = pygame.Surface(panel.size).convert()
+    layer = _profiler_panel
+    layer.fill((0, 0, 0))
+    x0, y0 = 4, 4
+    scale = 120.0 / FRAME_BUDGET_MS  # 120 px equivalen al presupuesto del cuadro
+    for i, (phase, avg) in enumerate(zip(PROFILER_PHASES, avgs)):
+        y = y0 + i * 12
+        layer.fill(PROFILER_COLORS[i], (x0 + 100, y + 2, max(1, min(120, int(avg * scale))), 8))
+        layer.blit(small_font.render(f"{phase} {avg:4.1f}", True, LIGHT_GRAY), (x0, y - 3))
+    # historial del total por cuadro, con la línea del presupuesto de 60 FPS
+    base_y = y0 + len(PROFILER_PHASES) * 12 + 48
+    budget_y = base_y - 36
+    for i, row in enumerate(profiler_history):
+        total = sum(row)
+        h = min(36, int(total / FRAME_BUDGET_MS * 36))
+        color = RED if total > FRAME_BUDGET_MS else GREEN
+        layer.fill(color, (x0 + i * 224 // PROFILER_WINDOW, base_y - h, 2, h))
+    layer.fill(YELLOW, (x0, budget_y, 224, 1))
+    if gpu is not None and surf is screen:
+        gpu.copy(layer, panel, volatile=True)
+    else:
+        surf.blit(layer, panel)
+    return panel
+
+# -----------------------------
+# CALIDAD ADAPTATIVA
+# -----------------------------
+# En equipos lentos el juego baja solo su costo visual cuando el promedio
+# móvil del tiempo de trabajo por cuadro (sin la espera de clock.tick) pasa
+# del presupuesto de 60 FPS, y lo sube otra vez cuando sobra margen. Entre
+# los dos umbrales hay una banda muerta; después de cada cambio se espera una
+# ventana entera de mediciones nuevas, y si una subida obliga a bajar enseguida
+# la siguiente subida espera el doble: así no oscila entre niveles.
+# Solo cambia lo visual: el paisaje no interviene en los choques, así que el
+# resultado de una carrera (y de sus grabaciones) no depende del nivel.
+# NASCAR_CALIDAD=alta|media|baja fija un nivel; por defecto es automático.
+
+QUALITY_LEVELS = (
+    # densidad: fracción del paisaje que aparece; partículas: fracción de las emitidas
+    {"nombre": "alta", "densidad": 1.0, "conos": True, "reflejos": True, "brillo_turbo": True,
+     "particulas": 1.0},
+    {"nombre": "media", "densidad": 0.6, "conos": True, "reflejos": False, "brillo_turbo": True,
+     "particulas": 0.6},
+    {"nombre": "baja", "densidad": 0.35, "conos": False, "reflejos": False, "brillo_turbo": False,
+     "particulas": 0.3},
+)
+QUALITY_NAMES = [q["nombre"] for q in QUALITY_LEVELS]
+QUALITY_WINDOW = 90                             # cuadros del promedio móvil
+QUALITY_DOWNGRADE_MS = FRAME_BUDGET_MS * 0.9    # por encima se baja un nivel
+QUALITY_UPGRADE_MS = FRAME_BUDGET_MS * 0.5      # por debajo se sube un nivel
+QUALITY_MAX_HOLD = QUALITY_WINDOW * 16
+
+_quality_env = os.environ.get("NASCAR_CALIDAD", "auto")
+quality_auto = _quality_env not in QUALITY_NAMES
+quality_index = 0 if quality_auto else QUALITY_NAMES.index(_quality_env)
+quality = QUALITY_LEVELS[quality_index]
+quality_changes = 0
+_quality_samples = deque(maxlen=QUALITY_WINDOW)
+_quality_since_change = 0
+_quality_last_step = 0          # +1 si el último cambio bajó la calidad, -1 si la subió
+_quality_hold = QUALITY_WINDOW  # cuadros con margen necesarios antes de subir
+
+
+def set_quality(index):
+    """Cambia al nivel 'index' (0 = alta). Devuelve True si cambió."""
+    global quality_index, quality, quality_changes, _quality_since_change, _quality_last_step
+    index = max(0, min(len(QUALITY_LEVELS) - 1, index))
+    if index == quality_index:
+        return False
+    _quality_last_step = 1 if index > quality_index else -1
+    quality_index = index
+    quality = QUALITY_LEVELS[index]
+    quality_changes += 1
+    _quality_samples.clear()
+    _quality_since_change = 0
+    invalidate_frame()
+    return True
+
+
+def reset_quality_window():
+    """Descarta las mediciones: el primer cuadro tras un menú no es representativo."""
+    global _quality_since_change
+    _quality_samples.clear()
+    _quality_since_change = 0
+
+
+def update_quality(work_ms):
+    """Anota el tiempo de trabajo de un cuadro y ajusta el nivel si hace falta.
+    Devuelve True si el nivel cambió."""
+    global _quality_since_change, _quality_hold
+    if not quality_auto:
+        return False
+    _quality_samples.append(work_ms)
+    _quality_since_change += 1
+    if len(_quality_samples) < QUALITY_WINDOW:
+        return False
+    avg = sum(_quality_samples) / len(_quality_samples)
+    if avg > QUALITY_DOWNGRADE_MS:
+        if _quality_last_step < 0 and _quality_since_change < 2 * QUALITY_WINDOW:
+            _quality_hold = min(_quality_hold * 2, QUALITY_MAX_HOLD)
+        return set_quality(quality_index + 1)
+    if avg < QUALITY_UPGRADE_MS and _quality_since_change >= _quality_hold:
+        return set_quality(quality_index - 1)
+    return False
+
+# -----------------------------
+# LATENCIA DE ENTRADA
+# -----------------------------
+# Cada cambio en las teclas de dirección o turbo se anota cuando una lectura lo
+# ve y se cierra en el primer present_frame que ya lo muestra. pygame no da la
+# hora de los eventos, así que cada muestra es un intervalo: desde la lectura
+# que lo vio (mínimo) y desde la lectura anterior, cuando todavía no estaba
+# (máximo). Se resume en frame_pacing_report().
+# Con entrada tardía (NASCAR_ENTRADA_TARDIA=1 o F7 en carrera) las teclas se
+# vuelven a leer antes de cada paso de simulación y justo antes de dibujar el
+# carro del jugador, que se dibuja en el camino que tomará el próximo paso con
+# esas teclas en vez de interpolar desde el anterior. La simulación no cambia:
+# solo se adelanta lo que se ve.
+
+INPUT_LATENCY_WINDOW = 600
+input_latencies = deque(maxlen=INPUT_LATENCY_WINDOW)  # (ms mínimo, ms máximo)
+late_input_enabled = bool(os.environ.get("NASCAR_ENTRADA_TARDIA"))
+_input_state = None
+_input_read_at = 0.0
+_input_pending = []   # cambios vistos que todavía no afectan a lo dibujado
+_input_applied = []   # cambios que saldrán en el próximo present_frame
+
+
+def reset_input_latency():
+    global _input_state
+    _input_state = None
+    input_latencies.clear()
+    _input_pending.clear()
+    _input_applied.clear()
+
+
+def read_race_keys():
+    """Lee (izquierda, derecha, turbo) del teclado y anota si cambiaron."""
+    global _input_state, _input_read_at
+    now = time.perf_counter()
+    keys = pygame.key.get_pressed()
+    state = (keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT])
+    if state != _input_state:
+        if _input_state is not None:
+            _input_pending.append((_input_read_at, now))
+        _input_state = state
+    _input_read_at = now
+    return state
+
+
+def read_race_keys_late():
+    """Lectura tardía: procesa los eventos pendientes del sistema sin sacarlos
+    de la cola (los sigue atendiendo el bucle) y vuelve a leer las teclas."""
+    pygame.event.pump()
+    return read_race_keys()
+
+
+def input_applied():
+    """Lo último que se leyó ya influye en lo que se va a dibujar."""
+    _input_applied.extend(_input_pending)
+    _input_pending.clear()
+
+
+def input_presented():
+    """Se presentó el cuadro: cierra las muestras de los cambios que muestra."""
+    if not _input_applied:
+        return
+    now = time.perf_counter()
+    for read_before, read_at in _input_applied:
+        input_latencies.append(((now - read_at) * 1000.0, (now - read_before) * 1000.0))
+    _input_applied.clear()
+
+
+def toggle_late_input():
+    global late_input_enabled
+    late_input_enabled = not late_input_enabled
+
+
+def input_latency_report():
+    """Percentiles (ms) de la latencia de entrada: mínimo y máximo de cada muestra."""
+    if not input_latencies:
+        return {}
+    lows = sorted(low for low, _ in input_latencies)
+    highs = sorted(high for _, high in input_latencies)
+
+    def pct(values, p):
+        return round(values[min(len(values) - 1, int(p / 100.0 * len(values)))], 2)
+
+    return {
+        "samples": len(lows),
+        "late_input": late_input_enabled,
+        "p50_ms": (pct(lows, 50), pct(highs, 50)),
+        "p90_ms": (pct(lows, 90), pct(highs, 90)),
+        "p99_ms": (pct(lows, 99), pct(highs, 99)),
+    }
+
+# -----------------------------
+# REBOBINADO (MODO PRÁCTICA)
+# -----------------------------
+# Con NASCAR_PRACTICA=1 un choque no termina la carrera: la deja en pausa y
+# Retroceso la lleva REWIND_SECONDS atrás (también se puede retroceder en
+# cualquier momento); Enter la termina. Cada REWIND_EVERY_TICKS pasos se guarda
+# una foto del estado de la simulación en un anillo de tamaño fijo. Una de cada
+# REWIND_KEYFRAME_EVERY fotos es clave (completa, comprimida); las demás se
+# comprimen con la clave como diccionario de zlib, así que ocupan poco más que
+# lo que cambió. Al rebobinar, race_log se corta en el paso restaurado: la
+# grabación describe la carrera que quedó y se repite igual.
+
+REWIND_SECONDS = 3
+REWIND_EVERY_TICKS = SIM_HZ // 4
+REWIND_WINDOW_SECONDS = 15
+REWIND_KEYFRAME_EVERY = 8
+REWIND_CAPACITY = REWIND_WINDOW_SECONDS * SIM_HZ // REWIND_EVERY_TICKS
+# globales de la carrera que cambian paso a paso (el resto es fijo por carrera)
+REWIND_GLOBALS = ("player_x", "is_boosting", "player_progress", "rival_progress", "score",
+                  "finish_line_y", "finish_visible", "finish_traveled", "praise_timer",
+                  "praise_text", "track_distance", "lap_count", "road_scroll",
+                  "obstacle_speed", "wheel_offset", "race_tick", "race_time_ms")
+
+practice_mode = bool(os.environ.get("NASCAR_PRACTICA"))
+
+
+class RewindBuffer:
+    """Anillo acotado de fotos (paso, clave comprimida, delta o None si es la clave)."""
+
+    def __init__(self, capacity=REWIND_CAPACITY):
+        self.snaps = deque(maxlen=capacity)
+        self._key = None       # (clave comprimida, clave sin comprimir) vigente
+        self._since_key = 0
+
+    def clear(self):
+        self.snaps.clear()
+        self._key = None
+
+    def capture(self, tick, state):
+        raw = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        if self._key is None or self._since_key >= REWIND_KEYFRAME_EVERY:
+            packed = zlib.compress(raw, 1)
+            self._key = (packed, raw)
+            self._since_key = 0
+            self.snaps.append((tick, packed, None))
+        else:
+            delta = zlib.compressobj(1, zdict=self._key[1])
+            self.snaps.append((tick, self._key[0], delta.compress(raw) + delta.flush()))
+        self._since_key += 1
+
+    def rewind(self, tick):
+        """Descarta las fotos posteriores a 'tick' y devuelve el estado de la
+        más nueva que queda (si todas son posteriores, la más vieja)."""
+        snaps = self.snaps
+        while len(snaps) > 1 and snaps[-1][0] > tick:
+            snaps.pop()
+        if not snaps:
+            return None
+        self._key = None  # la clave vigente pudo descartarse: la próxima foto es clave
+        _, packed, delta = snaps[-1]
+        raw = zlib.decompress(packed)
+        if delta is not None:
+            unpack = zlib.decompressobj(zdict=raw)
+            raw = unpack.decompress(delta) + unpack.flush()
+        return pickle.loads(raw)
+
+    def nbytes(self):
+        keys = {id(packed): len(packed) for _, packed, _ in self.snaps}
+        return sum(keys.values()) + sum(len(delta) for _, _, delta in self.snaps if delta)
+
+
+rewind_buffer = RewindBuffer()
+
+
+def capture_race_state():
+    g = globals()
+    return (tuple(g[name] for name in REWIND_GLOBALS),
+            tuple(stream.getstate() for stream in RACE_STREAMS),
+            entities.snapshot(), rival_field.snapshot(), scenery_snapshot())
+
+
+def restore_race_state(state):
+    global prev_player_x
+    values, streams, store, field, scenery = state
+    g = globals()
+    for name, value in zip(REWIND_GLOBALS, values):
+        g[name] = value
+    for stream, stream_state in zip(RACE_STREAMS, streams):
+        stream.setstate(stream_state)
+    entities.restore(store)
+    rebuild_lane_buckets()
+    rival_field.restore(field)
+    restore_scenery(scenery)
+    prev_player_x = player_x
+    del race_log[race_tick:]
+    # lo puramente visual no se guarda: se limpia
+    particles.clear()
+    _near_miss_seen.clear()
+
+
+def rewind_capture():
+    """Foto del paso actual si le toca (solo en modo práctica)."""
+    if practice_mode and race_tick % REWIND_EVERY_TICKS == 0:
+        rewind_buffer.capture(race_tick, capture_race_state())
+
+
+def rewind_race(seconds=REWIND_SECONDS):
+    """Vuelve la carrera unos segundos atrás. Devuelve False si no hay fotos."""
+    state = rewind_buffer.rewind(race_tick - seconds * SIM_HZ)
+    if state is None:
+        return False
+    restore_race_state(state)
+    invalidate_frame()
+    return True
+
 # -----------------------------
 # BUCLE PRINCIPAL
 # -----------------------------
 
-def main_loop():
-    global player_x, is_boosting, player_progress, rival_progress, score
-    global finish_line_y, finish_visible, finish_traveled, praise_timer, praise_text
-    global track_distance, lap_count, curve_amplitude, curve_wavelength
+def start_race(seed=None):
+    """Prepara la carrera: semilla, parámetros del nivel y paisaje inicial.
+    Con la misma semilla y las mismas entradas la carrera se repite idéntica."""
+    global obstacle_speed, curve_amplitude, prev_player_x, wheel_offset
+    global race_tick, race_time_ms, spawn_interval_ticks, praise_timer, rival_progress
 
-    obstacle_speed = level_params["obstacle_speed"]
-    rival_rate = level_params["rival_base"]
-    visibility_max = level_params["visibility"]
-    base_score = level_params["score_base"]
-    rival_multiplier = level_params["rival_multiplier"]
+    seed_race(random.getrandbits(32) if seed is None else seed)
+    race_tick = 0
+    race_time_ms = 0.0
+    praise_timer = 0
+    race_log.clear()
+    # los obstáculos salen cada 'spawn_ms' de tiempo simulado, no de reloj
+    spawn_interval_ticks = max(1, round(level_params["spawn_ms"] / SIM_DT_MS))
 
+    obstacle_speed = level_params["obstacle_speed"]
     curve_amplitude = level_params.get("curve_amp", curve_amplitude)
+    layout_name = layout_override or level_params.get("layout", "clasico")
+    build_track(TRACK_LAYOUTS[layout_name], lap_distance, curve_amplitude)
+    get_road_strip(level_params["visibility"])
+
+    # paisaje inicial: los tramos que ya se ven en pantalla al largar
+    reset_scenery(layout_name, road_scroll + min(SCENERY_TOP.values()) - HEIGHT)
+    update_scenery(road_scroll, get_road_center_x(track_distance) - ROAD_WIDTH // 2)
 
-    # plantar árboles / lámparas iniciales con espaciamiento
-    road_left_preview = get_road_center_x(track_distance) - ROAD_WIDTH // 2
-    left_range = (30, road_left_preview - 60)
-    right_range = (road_left_preview + ROAD_WIDTH + 20, WIDTH - 60)
-
-    for i in range(INITIAL_TREE_COUNT):
-        side = random.choice(["L", "R"])
-        r = left_range if side == "L" else right_range
-        x = place_non_overlapping(r, trees, TREE_MIN_SPACING)
-        trees.append(pygame.Rect(x, random.randint(-600, HEIGHT), 24, 64))
-
-    for i in range(INITIAL_LAMP_COUNT):
-        side = random.choice(["L", "R"])
-        r = left_range if side == "L" else right_range
-        x = place_non_overlapping(r, lamps, LAMP_MIN_SPACING)
-        lamps.append(pygame.Rect(x, random.randint(-800, HEIGHT), 10, 100))
-
-    finish_threshold = int(lap_distance * 0.9 / 20)
-    running = True
-    last_time = pygame.time.get_ticks()
+    # parrilla de salida del pelotón; rival_progress sigue siendo el del líder
+    rival_field.reset(level_params["rivals"], rng_rivals, level_params["rival_base"] * 0.1)
+    rival_progress = rival_field.leader()
+
+    prev_player_x = player_x
     wheel_offset = 0
 
-    # menor probabilidad de spawn para evitar amontonamiento
-    tree_spawn_chance = 0.035
-    lamp_spawn_chance = 0.015
 
-    while running:
+def steer(x, left, right, boost):
+    """Posición horizontal del jugador tras un paso con estas teclas."""
+    speed = boost_speed if boost else player_speed
+    _, road_left_x, _ = compute_lane_positions(track_distance)
+    if left and x > road_left_x + 6:
+        x -= speed
+    if right and x < road_left_x + ROAD_WIDTH - CAR_W - 6:
+        x += speed
+    return x
+
+
+def race_step(left, right, boost, spawn=None):
+    """Avanza la simulación un paso fijo de SIM_DT_MS y lo anota en race_log.
+    'spawn' fuerza (o impide) la salida de un obstáculo en este paso; con None
+    se sigue el calendario del nivel.
+    Devuelve "crash" si el jugador chocó, "finish" si terminó la carrera o None."""
+    global player_x, prev_player_x, is_boosting, player_progress, rival_progress, score
+    global finish_line_y, finish_visible, finish_traveled, praise_timer, praise_text
+    global track_distance, lap_count, road_scroll, obstacle_speed, wheel_offset
+    global race_tick, race_time_ms
+
+    race_tick += 1
+    race_time_ms = race_tick * SIM_DT_MS
+    if spawn is None:
+        spawn = race_tick % spawn_interval_ticks == 0
+    race_log.append(encode_input(left, right, boost, spawn))
+    if spawn:
+        spawn_obstacle_using_current_lanes()
+
+    prev_player_x = player_x
+    base_score = level_params["score_base"]
+
+    if boost:
+        if not is_boosting and turbo_sound and race_sounds_enabled:
+            turbo_sound.play()
+        is_boosting = True
+    else:
+        is_boosting = False
+
+    player_x = steer(player_x, left, right, boost)
+    prof_mark("entrada")
+
+    # árboles y faroles de los tramos de paisaje que la carretera va alcanzando
+    # (no afectan a los obstáculos: la calidad adaptativa puede omitir algunos)
+    update_scenery(road_scroll, get_road_center_x(track_distance) - ROAD_WIDTH // 2)
+    prof_mark("paisaje")
+
+    # todo se desplaza en un solo lote: el tráfico a su velocidad y el paisaje a la mitad
+    entities.scroll((obstacle_speed, obstacle_speed / 2, obstacle_speed / 2))
+
+    if player_collides(player_x, player_y, is_boosting):
+        return "crash"
+
+    passed = entities.cull()[KIND_OBSTACLE]
+    if passed:
+        gain = base_score + (base_score // 2 if is_boosting else 0)
+        score += gain * passed
+        player_progress += passed
+        inc = 40 + (25 if is_boosting else 0)
+        track_distance += inc * passed
+        praise_text = rng_praise.choice(praise_messages)
+        praise_timer = race_time_ms
+    prof_mark("obstaculos")
+
+    # el pelotón acelera con el turbo del jugador, como lo hacía el rival único
+    rival_field.step(1.2 if is_boosting else 1.0)
+    rival_progress = rival_field.leader()
+
+    if int(player_progress) and int(player_progress) % 10 == 0:
+        obstacle_speed = min(obstacle_speed + 0.004 * SIM_DT_MS, level_params["obstacle_speed"] + 6)
+
+    if track_distance >= lap_distance:
+        lap_count += 1
+        track_distance -= lap_distance
+        score += level_params.get("score_base", 15) * 3
+        if lap_count >= laps_total:
+            finish_visible = True
+            finish_traveled = True
+            return "finish"
+
+    if (player_progress >= int(lap_distance / 25)) and not finish_visible and lap_count >= (laps_total - 1):
+        finish_line_y = -200
+        finish_visible = True
+
+    wheel_offset = (wheel_offset + 1) % 6
+    # la carretera avanza a la misma velocidad que el paisaje
+    road_scroll += obstacle_speed / 2
+
+    if finish_visible and not finish_traveled:
+        finish_line_y += 2
+        if finish_line_y > player_y - 200:
+            finish_traveled = True
+            return "finish"
+    prof_mark("reglas")
+    return None
+
+
+def render_race(alpha, read_keys=None):
+    """Dibuja la carrera interpolando entre el paso anterior y el actual.
+    'alpha' es la fracción (0..1) del siguiente paso que ya transcurrió.
+    Con 'read_keys' (entrada tardía) las teclas se leen justo antes de dibujar
+    el carro del jugador y este se adelanta hacia su posición del próximo paso."""
+    # cuánto le falta a cada capa para llegar a su posición del paso actual
+    lag = 1.0 - alpha
+    obs_lag = int(lag * obstacle_speed)
+    scenery_lag = int(lag * obstacle_speed / 2)
+
+    begin_scene()
+    clear_scene(canvas, BLACK)
+    current_vis = min(level_params["visibility"], level_params["visibility"] + int(player_progress * 0.2))
+    # la carretera se mueve en cada cuadro: es una zona sucia más, y el fondo
+    # (negro fuera de la tira) solo cambia con la oscuridad del nivel
+    mark_dirty("escenario", draw_road_pixel(current_vis, track_distance, road_scroll - lag * obstacle_speed / 2))
+    background = int(current_vis)
+    prof_mark("carretera")
+
+    # dibujar reflejos y faroles: las luces se suman en la capa de luz
+    begin_lightmap()
+    for lamp in entities.rects(KIND_LAMP, -scenery_lag):
+        mark_dirty("escenario", draw_lamp_pixel(lamp))
+        if quality["reflejos"]:
+            draw_lamp_reflection_pixel(lamp)
+    composite_lightmap()
+    # cada estampa por separado: la unión de conos de ambos lados es casi la pantalla
+    for light in _lightmap_stamps:
+        mark_dirty("escenario", art_to_screen(light))
+    prof_mark("faroles")
+
+    # árboles y meta son primitivas: con texturas su capa va encima de las luces
+    scene_layer()
+
+    # dibujar árboles
+    for t in entities.rects(KIND_TREE, -scenery_lag):
+        draw_tree_pixel(t)
+        mark_dirty("escenario", (t.x - 12, t.y, t.w + 24, t.h))
+    prof_mark("arboles")
+
+    # dibujar meta si visible (el cartel va con el texto, después de ampliar)
+    show_finish = finish_visible and not finish_traveled
+    if show_finish:
+        line_y = int(finish_line_y - lag * 2)
+        left_x = get_road_center_x(track_distance) - ROAD_WIDTH // 2 + 40
+        right_x = get_road_center_x(track_distance) + ROAD_WIDTH // 2 - 40
+        pygame.draw.rect(canvas, LIGHT_GRAY, art_rect(left_x, line_y, 8, 120))
+        pygame.draw.rect(canvas, LIGHT_GRAY, art_rect(right_x, line_y, 8, 120))
+        sq = 12
+        for i in range(0, 10):
+            for j in range(0, 5):
+                color = WHITE if (i + j) % 2 == 0 else BLACK
+                px = left_x + 8 + i * sq
+                py = line_y + j * sq + 10
+                pygame.draw.rect(canvas, color, art_rect(px, py, sq, sq))
+        mark_layer((left_x, line_y, right_x - left_x + 8, 120))
+        mark_dirty("escenario", (left_x, line_y, right_x - left_x + 8, 120))
+    prof_mark("meta")
+
+    # dibujar obstáculos
+    for obs in entities.rects(KIND_OBSTACLE, -obs_lag):
+        draw_obstacle_pixel(obs)
+        mark_dirty("carros", obs)
+    prof_mark("trafico")
+
+    # pelotón rival: solo los carros que caen en pantalla
+    road_left_x = get_road_center_x(track_distance) - ROAD_WIDTH // 2
+    for rect in rival_field.draw(canvas, player_progress, road_left_x, is_boosting):
+        mark_dirty("carros", rect)
+    prof_mark("rival")
+
+    # partículas (escape del turbo, humo y chispas), halo del turbo y carro jugador
+    mark_dirty("carros", particles.draw(canvas))
+    if read_keys is None:
+        draw_player_x = int(prev_player_x + (player_x - prev_player_x) * alpha)
+    else:
+        left, right, boost = read_keys()
+        draw_player_x = int(player_x + (steer(player_x, left, right, boost) - player_x) * alpha)
+        input_applied()
+    if is_boosting and quality["brillo_turbo"]:
+        glow = blit_sprites(canvas, ((get_turbo_glow(), art_point(draw_player_x - 15, player_y - 10)),))
+        mark_dirty("carros", art_to_screen(glow[0]))
+
+    mark_dirty("carros", draw_car_pixel(draw_player_x, player_y, BLUE, wheels_offset=wheel_offset, scale=1.0))
+    prof_mark("turbo")
+
+    end_scene()
+    prof_mark("escalado")
+
+    if show_finish:
+        mark_dirty("escenario", center_text(screen, "-- META --", line_y - 20, small_font, ORANGE))
+
+    position, field = race_position()
+    hud_fields = (f"Puesto: {position}/{field}", f"Puntos: {score}", f"Nivel: {level_name}",
+                  f"Vueltas: {lap_count}/{laps_total}",
+                  f"Distancia vuelta: {int(track_distance)}/{int(lap_distance)}")
+    mark_dirty("hud", center_fields(screen, hud_fields, 22, hud_font, WHITE))
+    if praise_timer and race_time_ms - praise_timer < 1000:
+        mark_dirty("elogio", center_text(screen, praise_text, 50, small_font, LIGHT_BLUE))
+    prof_mark("hud")
+    return background
+
+
+def record_frame_pacing(frame_ms, steps):
+    global missed_deadlines
+    frame_times.append(frame_ms)
+    sim_steps_per_frame[steps] = sim_steps_per_frame.get(steps, 0) + 1
+    if frame_ms > FRAME_BUDGET_MS + FRAME_DEADLINE_SLACK_MS:
+        missed_deadlines += 1
+
+
+def frame_pacing_report():
+    """Resumen del ritmo de cuadros: percentiles, cuadros tarde y pasos por cuadro."""
+    ordered = sorted(frame_times)
+    if not ordered:
+        return {}
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    return {
+        "frames": len(ordered),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1],
+        "missed_deadlines": missed_deadlines,
+        "sim_steps_per_frame": dict(sorted(sim_steps_per_frame.items())),
+        "quality": quality["nombre"],
+        "quality_changes": quality_changes,
+    }
+
+
+def main_loop(seed=None, inputs=None):
+    """Bucle de carrera con paso de simulación fijo: el juego avanza siempre a
+    SIM_HZ pasos por segundo aunque se pierdan cuadros, y el dibujo interpola.
+    Con 'inputs' (tuplas de race_step por paso) reproduce una carrera grabada
+    a velocidad real en lugar de leer el teclado. En modo práctica un choque
+    deja la carrera en pausa hasta rebobinar (Retroceso) o terminar (Enter).
+    Devuelve el resultado: "crash", "finish" o "fin" si se acabó la grabación."""
+    global missed_deadlines, race_sounds_enabled
+    start_race(seed)
+    race_sounds_enabled = True
+    replay = iter(inputs) if inputs is not None else None
+    frame_times.clear()
+    sim_steps_per_frame.clear()
+    missed_deadlines = 0
+    reset_quality_window()
+    reset_input_latency()
+    practice = practice_mode and replay is None
+    rewind_buffer.clear()
+    if practice:
+        rewind_capture()
+
+    accumulator = 0.0
+    outcome = None
+    crashed = False
+    first_frame = True
+    while outcome is None:
         dt = clock.tick(60)
-        now = pygame.time.get_ticks()
+        prof_begin_frame()
+        # get_rawtime(): trabajo del cuadro anterior sin la espera de tick; el
+        # primer cuadro de la carrera incluye el tiempo pasado en el menú
+        if not first_frame:
+            update_quality(clock.get_rawtime())
+        first_frame = False
 
         for e in pygame.event.get():
-            if e.type == pygame.QUIT:
+            if is_quit_event(e):
+                save_recording(None)
                 pygame.quit(); sys.exit()
-            if e.type == SPAWN_OBSTACLE_EVENT:
-                spawn_obstacle_using_current_lanes()
             if e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_0:
+                    save_recording(None)
                     pygame.quit(); sys.exit()
+                if e.key == pygame.K_F3:
+                    toggle_profiler()
+                    prof_begin_frame()
+                if e.key == pygame.K_F4:
+                    toggle_dirty_rects()
+                if e.key == pygame.K_F6:
+                    toggle_lowres()
+                if e.key == pygame.K_F7:
+                    toggle_late_input()
+                if e.key == pygame.K_F8:
+                    toggle_scenery_thread()
+                if e.key == pygame.K_BACKSPACE and practice and rewind_race():
+                    crashed = False
+                    accumulator = 0.0
+                if e.key in (pygame.K_RETURN, pygame.K_KP_ENTER) and crashed:
+                    outcome = "crash"
+            if is_expose_event(e):
+                invalidate_frame()
+        if apply_loaded_assets():
+            invalidate_frame()
+        prof_mark("eventos")
+
+        late = late_input_enabled and replay is None
+        if replay is None:
+            left, right, boost = read_race_keys()
+        prof_mark("entrada")
+
+        # si el cuadro se atrasó demasiado, se descarta tiempo en vez de
+        # encadenar pasos sin fin (espiral de la muerte)
+        accumulator = min(accumulator + dt, SIM_DT_MS * MAX_SIM_STEPS_PER_FRAME)
+        if crashed:
+            accumulator = 0.0
+        steps = 0
+        while accumulator >= SIM_DT_MS and outcome is None:
+            if replay is None:
+                if late and steps:
+                    left, right, boost = read_race_keys_late()
+                outcome = race_step(left, right, boost)
+                input_applied()
+                if practice:
+                    if outcome == "crash":
+                        crashed, outcome = True, None
+                        accumulator = 0.0
+                    elif outcome is None:
+                        rewind_capture()
+            else:
+                step_input = next(replay, None)
+                outcome = race_step(*step_input) if step_input else "fin"
+            accumulator -= SIM_DT_MS
+            steps += 1
+        record_frame_pacing(dt, steps)
+
+        if outcome is None:
+            update_race_effects(dt)
+            prof_mark("particulas")
+            background = render_race(accumulator / SIM_DT_MS, read_race_keys_late if late and not crashed else None)
+            if crashed:
+                mark_dirty("elogio", center_text(screen, f"¡CHOQUE!  Retroceso: volver {REWIND_SECONDS} s  |  Enter: terminar",
+                                                 HEIGHT // 2, menu_font, ORANGE))
+            mark_dirty("hud", draw_profiler_overlay(screen))
+            prof_mark("perfil")
+            present_frame(background)
+            input_presented()
+            prof_mark("flip")
+            prof_end_frame()
+
+    race_sounds_enabled = False
+    prof_flush()
+    if os.environ.get("NASCAR_FRAME_STATS"):
+        print("Ritmo de cuadros:", frame_pacing_report())
+        print("Latencia de entrada:", input_latency_report())
+    if replay is not None:
+        return outcome
+    save_recording(outcome)
+    return outcome
 
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
-            current_speed = boost_speed
-            if not is_boosting and turbo_sound:
-                turbo_sound.play()
-            is_boosting = True
-        else:
-            current_speed = player_speed
-            is_boosting = False
-
-        lanes_now, road_left_x, road_center_x = compute_lane_positions(track_distance)
-        if keys[pygame.K_LEFT] and player_x > road_left_x + 6:
-            player_x -= current_speed
-        if keys[pygame.K_RIGHT] and player_x < road_left_x + ROAD_WIDTH - CAR_W - 6:
-            player_x += current_speed
-
-        for obs in obstacles[:]:
-            obs.y += obstacle_speed
-            if obs.colliderect(pygame.Rect(player_x, player_y, CAR_W, CAR_H)):
-                show_game_over()
-                return
-            if obs.y > HEIGHT + 50:
-                obstacles.remove(obs)
-                gain = base_score + (base_score // 2 if is_boosting else 0)
-                score += gain
-                player_progress += 1
-                inc = 40 + (25 if is_boosting else 0)
-                track_distance += inc
-                praise_text = random.choice(praise_messages)
-                praise_timer = now
-
-        rival_progress += rival_rate * (1.2 if is_boosting else 1.0) * 0.1
-
-        if int(player_progress) and int(player_progress) % 10 == 0:
-            obstacle_speed = min(obstacle_speed + 0.004 * dt, level_params["obstacle_speed"] + 6)
-
-        if track_distance >= lap_distance:
-            lap_count += 1
-            track_distance -= lap_distance
-            score += level_params.get("score_base", 15) * 3
-            if lap_count >= laps_total:
-                finish_visible = True
-                finish_traveled = True
-                celebration_animation()
-                show_game_over()
-                return
-
-        if (player_progress >= int(lap_distance / 25)) and not finish_visible and lap_count >= (laps_total - 1):
-            finish_line_y = -200
-            finish_visible = True
+# -----------------------------
+# ESCENAS
+# -----------------------------
+# El juego es una máquina de estados: cada escena corre hasta que decide cuál
+# sigue y devuelve su nombre. Las pantallas fijas (menú y fin de carrera) se
+# dibujan una vez y duermen en pygame.event.wait(): sin eventos no gastan CPU.
+# El hilo de fuentes publica ASSETS_READY para despertarlas y redibujar.
+
+def run_static_screen(draw, on_key, startup_phase=None):
+    """Dibuja 'draw' y espera eventos; solo redibuja si la ventana quedó
+    descubierta o cambiaron las fuentes. 'on_key(tecla)' devuelve la escena
+    siguiente, o None para seguir esperando. 0 o cerrar la ventana salen."""
+    needs_redraw = True
+    while True:
+        if apply_loaded_assets():
+            needs_redraw = True
+        if needs_redraw:
+            draw()
+            present_frame()
+            # la pantalla completa cambió: el modo sucio debe empezar de cero
+            invalidate_frame()
+            needs_redraw = False
+            if startup_phase and startup_phase not in startup_times:
+                startup_mark(startup_phase)
+                report_startup()
+        e = pygame.event.wait()
+        if is_expose_event(e):
+            needs_redraw = True
+        if is_quit_event(e):
+            pygame.quit(); sys.exit()
+        if e.type == pygame.KEYDOWN:
+            if e.key == pygame.K_0:
+                pygame.quit(); sys.exit()
+            scene = on_key(e.key)
+            if scene:
+                return scene
 
-        # generar árboles y lámparas con menor densidad y evitando solapamientos
-        road_left_x = get_road_center_x(track_distance) - ROAD_WIDTH // 2
-        if random.random() < tree_spawn_chance:
-            side = random.choice(["L", "R"])
-            r = (30, road_left_x - 40) if side == "L" else (road_left_x + ROAD_WIDTH + 20, WIDTH - 60)
-            x = place_non_overlapping(r, trees, TREE_MIN_SPACING)
-            trees.append(pygame.Rect(x, -60, 24, 64))
-        for t in trees[:]:
-            t.y += obstacle_speed / 2
-            if t.y > HEIGHT + 80:
-                trees.remove(t)
-
-        if random.random() < lamp_spawn_chance:
-            side = random.choice(["L", "R"])
-            r = (30, road_left_x - 40) if side == "L" else (road_left_x + ROAD_WIDTH + 20, WIDTH - 60)
-            x = place_non_overlapping(r, lamps, LAMP_MIN_SPACING)
-            lamps.append(pygame.Rect(x, -120, 10, 100))
-        for l in lamps[:]:
-            l.y += obstacle_speed / 2
-            if l.y > HEIGHT + 140:
-                lamps.remove(l)
-
-        wheel_offset = (wheel_offset + 1) % 6
-
-        # RENDER
-        screen.fill(BLACK)
-        current_vis = min(level_params["visibility"], level_params["visibility"] + int(player_progress * 0.2))
-        draw_road_pixel(current_vis, track_distance)
-
-        # dibujar reflejos y faroles
-        for lamp in lamps:
-            draw_lamp_pixel(lamp)
-            draw_lamp_reflection_pixel(lamp)
 
-        # dibujar árboles
-        for t in trees:
-            draw_tree_pixel(t)
-
-        # dibujar meta si visible
-        if finish_visible and not finish_traveled:
-            finish_line_y += 2
-            left_x = get_road_center_x(track_distance) - ROAD_WIDTH // 2 + 40
-            right_x = get_road_center_x(track_distance) + ROAD_WIDTH // 2 - 40
-            pygame.draw.rect(screen, LIGHT_GRAY, (left_x, finish_line_y, 8, 120))
-            pygame.draw.rect(screen, LIGHT_GRAY, (right_x, finish_line_y, 8, 120))
-            sq = 12
-            for i in range(0, 10):
-                for j in range(0, 5):
-                    color = WHITE if (i + j) % 2 == 0 else BLACK
-                    px = left_x + 8 + i * sq
-                    py = finish_line_y + j * sq + 10
-                    pygame.draw.rect(screen, color, (px, py, sq, sq))
-            center_text(screen, "-- META --", finish_line_y - 20, small_font, ORANGE)
-            if finish_line_y > player_y - 200:
-                finish_traveled = True
-                celebration_animation()
-                show_game_over()
-                return
-
-        # dibujar obstáculos
-        for obs in obstacles:
-            draw_obstacle_pixel(obs)
-
-        # dibujar rival con escala y pixel style
-        rival_rel = (rival_progress - player_progress) * 6
-        rival_screen_y = player_y - 200 + int(rival_rel)
-        rival_x = get_road_center_x(track_distance) + ROAD_WIDTH // 2 - 120
-        if -200 < rival_screen_y < HEIGHT:
-            draw_car_pixel(rival_x, rival_screen_y, ORANGE, scale=0.9)
-
-        # efecto turbo y carro jugador
-        if is_boosting:
-            for i in range(3):
-                flame_color = random.choice([(255, 200, 40), (255, 120, 10), (255, 60, 0)])
-                flame = pygame.Rect(player_x + 12, player_y + CAR_H + i * 6, 36, 10)
-                pygame.draw.ellipse(screen, flame_color, flame)
-            glow = pygame.Surface((CAR_W + 30, CAR_H + 30), pygame.SRCALPHA)
-            pygame.draw.ellipse(glow, (100, 170, 255, 60), glow.get_rect())
-            screen.blit(glow, (player_x - 15, player_y - 10))
-
-        draw_car_pixel(player_x, player_y, BLUE, wheels_offset=wheel_offset, scale=1.0)
-
-        hud_text = f"Puntos: {score}   |   Nivel: {level_name}   |   Vueltas: {lap_count}/{laps_total}   |   Distancia vuelta: {int(track_distance)}/{int(lap_distance)}"
-        center_text(screen, hud_text, 22, hud_font, WHITE)
-        if praise_timer and now - praise_timer < 1000:
-            center_text(screen, praise_text, 50, small_font, LIGHT_BLUE)
+def menu_scene():
+    def on_key(key):
+        if key in LEVEL_KEYS:
+            apply_level(LEVEL_KEYS[key])
+            reset_game()
+            return "carrera"
+        return None
+    return run_static_screen(draw_selection_screen, on_key, "primer cuadro del menú")
+
+
+def race_scene():
+    outcome = main_loop()
+    return "celebracion" if outcome == "finish" else "fin"
 
-        pygame.display.flip()
+
+def celebration_scene():
+    """Animación de campeón a 60 FPS durante CELEBRATION_MS."""
+    global celebrating, celebration_start
+    celebrating = True
+    celebration_start = pygame.time.get_ticks()
+    if cheer_sound:
+        cheer_sound.play()
+
+    particles.clear()
+    while pygame.time.get_ticks() - celebration_start < CELEBRATION_MS:
+        dt = clock.tick(60)
+        draw_celebration_frame(dt)
+        present_frame("celebracion")
+        for e in pygame.event.get():
+            if is_quit_event(e):
+                pygame.quit(); sys.exit()
+    celebrating = False
+    return "fin"
+
+
+def game_over_scene():
+    return run_static_screen(draw_game_over, lambda key: "menu" if key == pygame.K_SPACE else None)
+
+
+SCENES = {
+    "menu": menu_scene,
+    "carrera": race_scene,
+    "celebracion": celebration_scene,
+    "fin": game_over_scene,
+}
+
+
+def run_scenes(scene="menu"):
+    while True:
+        scene = SCENES[scene]()
 
 # -----------------------------
-# FLUJO DE EJECUCIÓN
+# GRABACIÓN Y REPETICIÓN
 # -----------------------------
-if __name__ == "__main__":
+# Cada paso de simulación deja un byte en race_log con las flechas, el turbo y
+# si salió un obstáculo. Como todo el azar de la carrera sale de la semilla,
+# semilla + nivel + esos bytes bastan para repetirla exactamente.
+# NASCAR_GRABAR=archivo guarda la última carrera; --repetir archivo la reproduce.
+#
+# Formato (little endian): cabecera REPLAY_HEADER, nombre del nivel en UTF-8 y
+# los bytes de entrada comprimidos por tramos (valor, largo en varint).
+
+INPUT_LEFT, INPUT_RIGHT, INPUT_BOOST, INPUT_SPAWN = 1, 2, 4, 8
+REPLAY_MAGIC = b"NSCR"
+REPLAY_VERSION = 1
+# magia, versión, SIM_HZ, semilla, resultado, pasos, puntos, largo del nombre
+REPLAY_HEADER = struct.Struct("<4sBHQBIiB")
+REPLAY_OUTCOMES = (None, "crash", "finish", "fin")
+
+race_log = bytearray()
+
+
+def encode_input(left, right, boost, spawn):
+    return ((INPUT_LEFT if left else 0) | (INPUT_RIGHT if right else 0)
+            | (INPUT_BOOST if boost else 0) | (INPUT_SPAWN if spawn else 0))
+
+
+def _pack_runs(log):
+    out = bytearray()
+    i, n = 0, len(log)
+    while i < n:
+        value = log[i]
+        j = i + 1
+        while j < n and log[j] == value:
+            j += 1
+        out.append(value)
+        run = j - i
+        while run >= 0x80:
+            out.append((run & 0x7F) | 0x80)
+            run >>= 7
+        out.append(run)
+        i = j
+    return out
+
+
+def _unpack_runs(data):
+    out = bytearray()
+    pos, n = 0, len(data)
+    while pos < n:
+        value = data[pos]
+        pos += 1
+        run = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            run |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        out.extend(bytes((value,)) * run)
+    return out
+
+
+def encode_recording(outcome=None):
+    """Empaqueta la carrera actual (semilla, nivel, resultado y entradas)."""
+    name = level_name.encode("utf-8")
+    header = REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, SIM_HZ, race_seed,
+                                REPLAY_OUTCOMES.index(outcome), len(race_log), score, len(name))
+    return header + name + _pack_runs(race_log)
+
+
+def decode_recording(data):
+    magic, version, hz, seed, outcome, ticks, final_score, name_len = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError("no es una grabación de NASCAR Pixel FX")
+    if hz != SIM_HZ:
+        raise ValueError(f"grabación hecha a {hz} pasos/s, el juego usa {SIM_HZ}")
+    start = REPLAY_HEADER.size
+    inputs = _unpack_runs(data[start + name_len:])
+    if len(inputs) != ticks:
+        raise ValueError("grabación incompleta")
+    return {
+        "level": data[start:start + name_len].decode("utf-8"),
+        "seed": seed,
+        "outcome": REPLAY_OUTCOMES[outcome],
+        "ticks": ticks,
+        "score": final_score,
+        "inputs": inputs,
+    }
+
+
+def save_recording(outcome, path=None):
+    """Guarda la carrera en 'path' o en NASCAR_GRABAR; sin ninguno no hace nada."""
+    path = path or os.environ.get("NASCAR_GRABAR")
+    if not path:
+        return
+    with open(path, "wb") as f:
+        f.write(encode_recording(outcome))
+
+
+def load_recording(path):
+    with open(path, "rb") as f:
+        return decode_recording(f.read())
+
+
+def replay_race(recording, render=False, overrides=None):
+    """Repite una carrera grabada ('recording' es una ruta o lo que devuelve
+    load_recording). Sin 'render' corre sin dibujar, tan rápido como se pueda;
+    con 'render' la muestra a velocidad real con el mismo bucle del juego.
+    Con 'overrides' se re-simulan las mismas entradas con parámetros de nivel
+    reajustados: los obstáculos siguen entonces el calendario nuevo en lugar
+    del grabado, así que el resultado puede cambiar a propósito.
+    Devuelve un dict con el resultado obtenido y el grabado."""
+    rec = load_recording(recording) if isinstance(recording, str) else recording
     reset_game()
-    selection_screen()
-    pygame.time.set_timer(SPAWN_OBSTACLE_EVENT, level_params["spawn_ms"])
+    apply_level(rec["level"], overrides)
+    inputs = [(bits & INPUT_LEFT, bits & INPUT_RIGHT, bits & INPUT_BOOST,
+               None if overrides else bits & INPUT_SPAWN) for bits in rec["inputs"]]
+
+    if render:
+        outcome = main_loop(rec["seed"], inputs)
+    else:
+        start_race(rec["seed"])
+        outcome = "fin"
+        for step_input in inputs:
+            result = race_step(*step_input)
+            if result:
+                outcome = result
+                break
+    # una carrera abandonada se grabó sin resultado y termina con la grabación
+    recorded = rec["outcome"] or "fin"
+    return {
+        "outcome": outcome,
+        "score": score,
+        "ticks": race_tick,
+        "recorded_outcome": recorded,
+        "recorded_score": rec["score"],
+        "recorded_ticks": rec["ticks"],
+        "matches": (outcome, score, race_tick) == (recorded, rec["score"], rec["ticks"]),
+    }
+
+
+def resimulate(paths, overrides=None):
+    """Re-simula sin ventana muchas carreras grabadas; útil al reajustar
+    level_params. Devuelve la lista de resultados de replay_race."""
+    return [replay_race(path, overrides=overrides) for path in paths]
 
-    while True:
-        main_loop()
-        show_game_over()
-        reset_game()
-        selection_screen()
-        pygame.time.set_timer(SPAWN_OBSTACLE_EVENT, level_params["spawn_ms"])
+# -----------------------------
+# VERIFICACIÓN DEL RASTERIZADOR
+# -----------------------------
+
+def _pixel_rects_blocks(surf, rects, color):
+    for x, y, w, h in rects:
+        pixel_rect_blocks(surf, x, y, w, h, color)
+
+
+def compare_rasterizer(repeats=200):
+    """Compara píxel a píxel el rasterizador por lotes contra el de referencia
+    (un rect por bloque) y mide cuánto tarda cada draw_* con cada uno.
+    Devuelve True si todas las salidas son idénticas."""
+    global pixel_rect, pixel_rects
+    batched = (pixel_rect, pixel_rects)
+    reference = (pixel_rect_blocks, _pixel_rects_blocks)
+    tree = pygame.Rect(203, 101, 24, 64)
+
+    def sprite_on_screen():
+        screen.blit(render_car_sprite(BLUE, 0.9, True, True), (301, 222))
+
+    def road():
+        # la tira se cachea: sin vaciarla ambos pasos copiarían la misma superficie
+        _road_strip_cache.clear()
+        draw_road_pixel(60, 1234.0, 77.0)
+
+    def celebration():
+        particles.clear()
+        random.seed(1234)
+        draw_celebration_frame()
+
+    def odd_rects():
+        # tamaños que no son múltiplos de PIXEL, sobre pantalla y sobre SRCALPHA
+        layer = pygame.Surface((120, 90), pygame.SRCALPHA)
+        for i in range(1, 40):
+            pixel_rect(screen, 5 * i, 7 * i % 500, i, 41 - i, (i * 6, 255 - i * 6, 90))
+            pixel_rect(layer, i, i * 2, 50 - i, i, (250, 250, 200, i * 6))
+        screen.blit(layer, (700, 400))
+
+    cases = [
+        ("draw_road_pixel", road),
+        ("draw_tree_pixel", lambda: draw_tree_pixel(tree)),
+        ("render_lamp_sprite", lambda: screen.blit(render_lamp_sprite(), (607, 133))),
+        ("render_lamp_reflection", lambda: screen.blit(render_lamp_reflection(), (531, 173))),
+        ("render_car_sprite", sprite_on_screen),
+        ("draw_celebration_frame", celebration),
+        ("pixel_rect (tamaños impares)", odd_rects),
+    ]
+    all_equal = True
+    try:
+        for name, draw in cases:
+            outputs = []
+            timings = []
+            for pixel_rect, pixel_rects in (reference, batched):
+                screen.fill((17, 34, 51))
+                draw()
+                outputs.append(pygame.image.tostring(screen, "RGB"))
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    draw()
+                timings.append((time.perf_counter() - start) * 1000.0 / repeats)
+            equal = outputs[0] == outputs[1]
+            all_equal = all_equal and equal
+            gain = timings[0] / timings[1] if timings[1] > 0 else float("inf")
+            print(f"{name:30s} {'OK     ' if equal else 'DIFIERE'}  "
+                  f"referencia {timings[0]:7.3f} ms  lotes {timings[1]:7.3f} ms  x{gain:5.1f}")
+    finally:
+        pixel_rect, pixel_rects = batched
+    return all_equal
+
+
+TEXTURE_TOLERANCE = 4  # por canal: la mezcla alfa de SDL redondea distinto que Surface.blit
+                       # en los bordes suavizados del texto
+
+
+def compare_texture_renderer(repeats=100):
+    """Dibuja los mismos cuadros con el camino de software (referencia) y con
+    el renderizador de texturas y los compara píxel a píxel; también mide cada
+    cuadro con su presentación. Devuelve True si todos coinciden (con
+    TEXTURE_TOLERANCE por canal). En Linux sin pantalla usa el Renderer por software."""
+    global lowres_enabled, profiler_enabled
+    if sdl2_video is None:
+        print("pygame._sdl2 no está disponible: no hay renderizador de texturas que comparar")
+        return False
+    previous = (render_backend, lowres_enabled, profiler_enabled)
+
+    def race(lowres):
+        def draw():
+            global lowres_enabled
+            lowres_enabled = lowres
+            render_race(0.5)
+            draw_profiler_overlay(screen)
+        return draw
+
+    def celebration():
+        random.seed(1234)
+        particles.clear()
+        draw_celebration_frame()
+
+    cases = [
+        ("carrera", race(False)),
+        ("carrera (baja resolución)", race(True)),
+        ("celebración", celebration),
+        ("menú", draw_selection_screen),
+        ("fin de carrera", draw_game_over),
+    ]
+    # una carrera fija, avanzada hasta tener tráfico, rivales, turbo y partículas
+    reset_game()
+    apply_level("MEDIO")
+    start_race(2024)
+    for tick in range(420):
+        race_step(tick % 90 < 20, False, tick > 300)
+    random.seed(99)
+    update_race_effects(SIM_DT_MS)
+    profiler_enabled = True
+    profiler_history.extend([[1.0] * len(PROFILER_PHASES)] * 8)
+
+    all_equal = True
+    try:
+        for name, draw in cases:
+            outputs = []
+            timings = []
+            for backend in ("software", "texturas"):
+                set_render_backend(backend, hidden=True)
+                clear_scene(screen, (17, 34, 51))
+                draw()
+                if gpu is None:
+                    image = screen
+                else:
+                    gpu.compose()
+                    image = gpu.renderer.to_surface()
+                outputs.append(pygame.image.tostring(image, "RGB"))
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    draw()
+                    present_frame()
+                timings.append((time.perf_counter() - start) * 1000.0 / repeats)
+            # diferencia por canal; el cuadro difiere si algún canal pasa la tolerancia
+            if np is not None:
+                ref, tex = (np.frombuffer(data, np.uint8).astype(np.int16) for data in outputs)
+                diff = np.abs(ref - tex)
+                worst, equal = int(diff.max()), bool((diff <= TEXTURE_TOLERANCE).all())
+            else:
+                worst = max(abs(a - b) for a, b in zip(*outputs))
+                equal = worst <= TEXTURE_TOLERANCE
+            all_equal = all_equal and equal
+            print(f"{name:30s} {'OK     ' if equal else 'DIFIERE'}  máx {worst:3d}  "
+                  f"software {timings[0]:7.3f} ms  texturas {timings[1]:7.3f} ms")
+    finally:
+        set_render_backend(previous[0])
+        lowres_enabled, profiler_enabled = previous[1:]
+        profiler_history.clear()
+    return all_equal
+
+# -----------------------------
+# FLUJO DE EJECUCIÓN
+# -----------------------------
+if __name__ == "__main__":
+    if "--verificar-raster" in sys.argv:
+        sys.exit(0 if compare_rasterizer() else 1)
+    if "--verificar-texturas" in sys.argv:
+        sys.exit(0 if compare_texture_renderer() else 1)
+    if "--repetir" in sys.argv:
+        # python PY_NASCAR_EMAYLEO.py --repetir carrera.bin [--sin-ventana]
+        result = replay_race(sys.argv[sys.argv.index("--repetir") + 1],
+                             render="--sin-ventana" not in sys.argv)
+        print("Repetición:", result)
+        sys.exit(0 if result["matches"] else 1)
+
+    run_scenes()
@@ -0,0 +1,268 @@
+"""
+PY_NASCAR_EMAYLEO_BENCH.py
+Benchmark de dibujo sin ventana (driver de video "dummy" de SDL).
+Mide cada draw_* del juego y un cuadro completo de carrera sobre escenas
+fijas (cantidad de obstáculos, árboles y faroles por nivel), guarda los
+resultados como línea base en JSON y falla si algo empeora más del umbral.
+
+Para ejecutar:
+    python PY_NASCAR_EMAYLEO_BENCH.py              # compara contra la línea base
+    python PY_NASCAR_EMAYLEO_BENCH.py --guardar    # guarda una nueva línea base
+    python PY_NASCAR_EMAYLEO_BENCH.py --baja-res   # mide el framebuffer de baja resolución
+    python PY_NASCAR_EMAYLEO_BENCH.py --texturas   # compone con el renderizador SDL2
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import pygame
+import PY_NASCAR_EMAYLEO as game
+
+BASELINE_FILE = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.15   # 15% más lento que la línea base = regresión
+MIN_REGRESSION_MS = 0.05   # diferencias menores se consideran ruido
+
+# (nivel, nombre de escena, obstáculos, árboles, faroles)
+SCENES = [
+    ("FÁCIL", "normal", 3, 6, 4),
+    ("FÁCIL", "denso", 12, 24, 12),
+    ("MEDIO", "normal", 5, 8, 5),
+    ("MEDIO", "denso", 16, 30, 15),
+    ("EXTREMO", "normal", 8, 10, 6),
+    ("EXTREMO", "denso", 24, 40, 20),
+]
+
+
+# -----------------------------
+# ESCENAS
+# -----------------------------
+
+def build_scene(level, n_obstacles, n_trees, n_lamps, seed=2024):
+    """Prepara el estado global del juego con una escena fija y repetible."""
+    random.seed(seed)
+    game.reset_game()
+    game.apply_level(level)
+    game.start_race()
+    game.entities.clear()
+    game.reset_collisions()
+    pygame.event.clear()
+
+    lanes, left_x, _ = game.compute_lane_positions(game.track_distance)
+    for i in range(n_obstacles):
+        lane = i % len(lanes)
+        # los obstáculos quedan por encima del jugador para no provocar choques
+        y = -game.CAR_H + (i // len(lanes)) * 130
+        y = min(y, game.player_y - game.CAR_H - 40)
+        eid = game.entities.spawn(game.KIND_OBSTACLE, lanes[lane], y, game.CAR_W, game.CAR_H, lane)
+        game.lane_buckets[lane].append(eid)
+
+    sides = [(30, left_x - 40), (left_x + game.ROAD_WIDTH + 20, game.WIDTH - 60)]
+    for kind, count, w, h in ((game.KIND_TREE, n_trees, 24, 64), (game.KIND_LAMP, n_lamps, 10, 100)):
+        xs = [random.randint(*sides[i % 2]) for i in range(count)]
+        ys = [random.randint(-100, game.HEIGHT - 50) for _ in range(count)]
+        game.entities.spawn_batch(kind, xs, ys, w, h)
+
+
+# -----------------------------
+# MEDICIONES
+# -----------------------------
+
+def _rects(kind):
+    return [pygame.Rect(r) for r in game.entities.rects(kind)]
+
+
+def bench_draw_road():
+    game.draw_road_pixel(game.level_params["visibility"], 1234.0, 77.0)
+    return 1
+
+
+def bench_draw_tree():
+    trees = _rects(game.KIND_TREE)
+    for t in trees:
+        game.draw_tree_pixel(t)
+    return len(trees)
+
+
+def bench_draw_lamp():
+    lamps = _rects(game.KIND_LAMP)
+    game.begin_lightmap()
+    for lamp in lamps:
+        game.draw_lamp_pixel(lamp)
+    game.composite_lightmap()
+    return len(lamps)
+
+
+def bench_draw_lamp_reflection():
+    lamps = _rects(game.KIND_LAMP)
+    game.begin_lightmap()
+    for lamp in lamps:
+        game.draw_lamp_reflection_pixel(lamp)
+    game.composite_lightmap()
+    return len(lamps)
+
+
+def bench_draw_car():
+    game.draw_car_pixel(game.player_x, game.player_y, game.BLUE)
+    game.draw_car_pixel(game.player_x + 150, game.player_y - 200, game.ORANGE, scale=0.9)
+    return 2
+
+
+def bench_draw_obstacle():
+    obstacles = _rects(game.KIND_OBSTACLE)
+    for obs in obstacles:
+        game.draw_obstacle_pixel(obs)
+    return len(obstacles)
+
+
+def bench_celebration_frame():
+    game.draw_celebration_frame()
+    game.present_frame()
+    return 1
+
+
+def bench_race_frame():
+    game.race_step(False, False, False)
+    game.update_race_effects(game.SIM_DT_MS)
+    game.render_race(0.5)
+    game.present_frame()
+    return 1
+
+
+BENCHMARKS = [
+    ("draw_road_pixel", bench_draw_road, False),
+    ("draw_tree_pixel", bench_draw_tree, False),
+    ("draw_lamp_pixel", bench_draw_lamp, False),
+    ("draw_lamp_reflection_pixel", bench_draw_lamp_reflection, False),
+    ("draw_car_pixel", bench_draw_car, False),
+    ("draw_obstacle_pixel", bench_draw_obstacle, False),
+    ("celebration_frame", bench_celebration_frame, False),
+    # el cuadro completo modifica el estado: se reconstruye la escena en cada repetición
+    ("main_loop_frame", bench_race_frame, True),
+]
+
+
+def measure(fn, scene, rebuild, repeats):
+    """Mediana de 'repeats' ejecuciones: (ms por llamada, ms por cuadro).
+    Las funciones sueltas dibujan en el lienzo del modo activo (begin_scene);
+    los cuadros completos abren y amplían su propia escena."""
+    build_scene(*scene)
+    game.begin_scene()
+    fn()  # calentamiento: llena las cachés de sprites y texto
+    frame_times = []
+    calls = 1
+    for _ in range(repeats):
+        if rebuild:
+            build_scene(*scene)
+        game.begin_scene()
+        start = time.perf_counter()
+        calls = fn()
+        frame_times.append((time.perf_counter() - start) * 1000.0)
+    game.end_scene()
+    game.present_frame()  # con texturas vacía la cola de copias
+    per_frame = statistics.median(frame_times)
+    per_call = per_frame / calls if calls else 0.0
+    return per_call, per_frame
+
+
+def run_suite(repeats, only=None, lowres=False, textures=False):
+    game.lowres_enabled = lowres
+    mode = "/baja_res" if lowres else ""
+    if textures:
+        if game.set_render_backend("texturas", hidden=True) != "texturas":
+            raise SystemExit("El renderizador de texturas no está disponible")
+        mode += "/texturas"
+    results = {}
+    for level, scene_name, n_obs, n_trees, n_lamps in SCENES:
+        scene = (level, n_obs, n_trees, n_lamps)
+        for name, fn, rebuild in BENCHMARKS:
+            if only and name not in only:
+                continue
+            per_call, per_frame = measure(fn, scene, rebuild, repeats)
+            key = f"{level}/{scene_name}/{name}{mode}"
+            results[key] = {"per_call_ms": round(per_call, 4), "per_frame_ms": round(per_frame, 4)}
+    return results
+
+
+# -----------------------------
+# LÍNEA BASE
+# -----------------------------
+
+def compare(results, baseline, threshold):
+    """Devuelve la lista de regresiones (clave, base, actual)."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        before = base["per_frame_ms"]
+        after = current["per_frame_ms"]
+        if after > before * (1.0 + threshold) and after - before > MIN_REGRESSION_MS:
+            regressions.append((key, before, after))
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'escena / función':66s} {'ms/llamada':>10s} {'ms/cuadro':>10s} {'base':>10s}")
+    for key, r in results.items():
+        base = baseline.get(key, {}).get("per_frame_ms")
+        base_txt = f"{base:10.3f}" if base is not None else f"{'-':>10s}"
+        print(f"{key:66s} {r['per_call_ms']:10.3f} {r['per_frame_ms']:10.3f} {base_txt}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de dibujo de NASCAR Pixel FX")
+    parser.add_argument("--guardar", action="store_true", help="guarda los resultados como nueva línea base")
+    parser.add_argument("--base", default=BASELINE_FILE, help="archivo JSON de línea base")
+    parser.add_argument("--umbral", type=float, default=DEFAULT_THRESHOLD,
+                        help="fracción de empeoramiento tolerada (0.15 = 15%%)")
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--solo", nargs="*", help="medir solo estas funciones")
+    parser.add_argument("--baja-res", action="store_true",
+                        help="dibuja en el framebuffer de baja resolución (claves con /baja_res)")
+    parser.add_argument("--texturas", action="store_true",
+                        help="compone con el renderizador SDL2 de texturas (claves con /texturas)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.repeticiones, args.solo, args.baja_res, args.texturas)
+
+    baseline = {}
+    if os.path.exists(args.base):
+        with open(args.base, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    print_table(results, baseline)
+
+    if args.guardar:
+        data = {
+            "meta": {
+                "python": platform.python_version(),
+                "pygame": pygame.version.ver,
+                "machine": platform.machine(),
+                "repeats": args.repeticiones,
+            },
+            "results": results,
+        }
+        with open(args.base, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {args.base}")
+        return 0
+
+    if not baseline:
+        print("No hay línea base: ejecuta con --guardar para crearla.")
+        return 0
+    regressions = compare(results, baseline, args.umbral)
+    for key, before, after in regressions:
+        print(f"REGRESIÓN {key}: {before:.3f} ms -> {after:.3f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+PY_NASCAR_EMAYLEO_SIM.py
+Simulador de carreras sin ventana para calibrar la dificultad.
+Corre las reglas del juego (race_step: salida de obstáculos, aumento de
+velocidad, progreso del rival, vueltas y puntaje) con un piloto automático en
+lugar del teclado, reparte lotes de carreras con semilla entre varios
+procesos y resume por nivel: victorias, tiempo hasta el choque y puntajes.
+
+Para ejecutar:
+    python PY_NASCAR_EMAYLEO_SIM.py                         # 1000 carreras por nivel
+    python PY_NASCAR_EMAYLEO_SIM.py --carreras 20000 --politica esquivar_turbo
+    python PY_NASCAR_EMAYLEO_SIM.py --niveles MEDIO --param spawn_ms=900 --param obstacle_speed=9
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import multiprocessing
+import random
+import statistics
+import sys
+import time
+
+import PY_NASCAR_EMAYLEO as game
+
+DEFAULT_RACES = 1000
+BATCH_SIZE = 50
+MAX_RACE_SECONDS = 600     # una carrera que no termina en 10 min simulados se corta
+LOOKAHEAD_PX = 260         # distancia a la que el piloto automático ve un obstáculo
+
+
+# -----------------------------
+# PILOTOS AUTOMÁTICOS
+# -----------------------------
+# Una política recibe un random.Random propio de la carrera y devuelve una
+# función que, en cada paso, decide (izquierda, derecha, turbo) leyendo el
+# estado global del juego.
+
+def policy_still(rng):
+    """No toca nada: mide cuánto aguanta el nivel por sí solo."""
+    def step():
+        return False, False, False
+    return step
+
+
+def policy_random(rng):
+    """Mantiene teclas al azar durante tramos cortos, como un jugador torpe."""
+    held = [False, False, False]
+
+    def step():
+        if rng.random() < 0.05:
+            held[0] = rng.random() < 0.4
+            held[1] = not held[0] and rng.random() < 0.6
+            held[2] = rng.random() < 0.2
+        return tuple(held)
+    return step
+
+
+def _lane_threats(lanes):
+    """Obstáculos por carril dentro del alcance de visión del jugador."""
+    top = game.player_y - LOOKAHEAD_PX
+    bottom = game.player_y + game.CAR_H
+    threats = [False] * len(lanes)
+    for r in game.entities.rects(game.KIND_OBSTACLE):
+        if r.bottom >= top and r.top <= bottom:
+            lane = min(range(len(lanes)), key=lambda i: abs(lanes[i] - r.x))
+            threats[lane] = True
+    return threats
+
+
+def _dodger(rng, boost_when_clear):
+    target = [None]
+
+    def step():
+        lanes, _, _ = game.compute_lane_positions(game.track_distance)
+        x = game.player_x
+        current = min(range(len(lanes)), key=lambda i: abs(lanes[i] - x))
+        threats = _lane_threats(lanes)
+        if target[0] is None or threats[target[0]]:
+            free = [i for i in range(len(lanes)) if not threats[i]]
+            if free:
+                target[0] = min(free, key=lambda i: (abs(i - current), rng.random()))
+            else:
+                target[0] = current
+        goal = lanes[target[0]]
+        # margen de un paso para no quedar oscilando alrededor del carril
+        tolerance = game.boost_speed if game.is_boosting else game.player_speed
+        left = x > goal + tolerance
+        right = x < goal - tolerance
+        boost = boost_when_clear and not any(threats)
+        return left, right, boost
+    return step
+
+
+def policy_dodge(rng):
+    """Cambia al carril libre más cercano cuando ve un obstáculo en el suyo."""
+    return _dodger(rng, boost_when_clear=False)
+
+
+def policy_dodge_boost(rng):
+    """Igual que 'esquivar', pero usa el turbo cuando no ve obstáculos."""
+    return _dodger(rng, boost_when_clear=True)
+
+
+POLICIES = {
+    "quieto": policy_still,
+    "aleatorio": policy_random,
+    "esquivar": policy_dodge,
+    "esquivar_turbo": policy_dodge_boost,
+}
+
+
+# -----------------------------
+# SIMULACIÓN
+# -----------------------------
+
+def simulate_race(level, seed, policy, overrides=None, max_seconds=MAX_RACE_SECONDS):
+    """Corre una carrera completa sin dibujar.
+    Devuelve (resultado, segundos simulados, puntaje, ganó)."""
+    game.reset_game()
+    game.apply_level(level, overrides)
+    game.start_race(seed)
+    step = POLICIES[policy](random.Random(seed))
+    max_ticks = int(max_seconds * game.SIM_HZ)
+    outcome = "tiempo"
+    for _ in range(max_ticks):
+        result = game.race_step(*step())
+        if result:
+            outcome = result
+            break
+    # misma regla que la pantalla de fin de carrera
+    won = game.player_progress > game.rival_progress
+    return outcome, game.race_time_ms / 1000.0, game.score, won
+
+
+def run_batch(job):
+    level, seeds, policy, overrides, max_seconds = job
+    return level, [simulate_race(level, s, policy, overrides, max_seconds) for s in seeds]
+
+
+def make_jobs(levels, races, base_seed, policy, overrides, max_seconds):
+    jobs = []
+    for li, level in enumerate(levels):
+        # semillas distintas por nivel y repetibles para la misma --semilla
+        first = base_seed + li * races
+        for start in range(0, races, BATCH_SIZE):
+            seeds = range(first + start, first + min(start + BATCH_SIZE, races))
+            jobs.append((level, seeds, policy, overrides, max_seconds))
+    return jobs
+
+
+def run_simulation(levels, races, policy, processes=None, base_seed=0,
+                   overrides=None, max_seconds=MAX_RACE_SECONDS):
+    """Reparte las carreras en lotes entre 'processes' procesos (1 = sin pool).
+    Devuelve {nivel: lista de resultados de simulate_race}."""
+    jobs = make_jobs(levels, races, base_seed, policy, overrides, max_seconds)
+    results = {level: [] for level in levels}
+    if processes == 1:
+        for level, batch in map(run_batch, jobs):
+            results[level].extend(batch)
+        return results
+    # "spawn": cada proceso importa el juego desde cero; heredar por fork el
+    # estado de SDL y los hilos de carga del proceso padre puede colgarlo
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        for level, batch in pool.imap_unordered(run_batch, jobs):
+            results[level].extend(batch)
+        # SDL convierte SIGTERM en un evento de salida, así que terminate()
+        # no detiene a los procesos: se cierran en orden antes de salir
+        pool.close()
+        pool.join()
+    return results
+
+
+# -----------------------------
+# RESUMEN
+# -----------------------------
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(races):
+    n = len(races)
+    crash_times = [t for outcome, t, _, _ in races if outcome == "crash"]
+    scores = [s for _, _, s, _ in races]
+    return {
+        "carreras": n,
+        "victorias": sum(won for *_, won in races) / n,
+        "terminadas": sum(outcome == "finish" for outcome, *_ in races) / n,
+        "choques": len(crash_times) / n,
+        "choque_s": {
+            "p10": _percentile(crash_times, 0.10),
+            "mediana": statistics.median(crash_times) if crash_times else 0.0,
+            "p90": _percentile(crash_times, 0.90),
+        },
+        "puntaje": {
+            "media": statistics.fmean(scores),
+            "p10": _percentile(scores, 0.10),
+            "mediana": statistics.median(scores),
+            "p90": _percentile(scores, 0.90),
+            "max": max(scores),
+        },
+    }
+
+
+def print_summary(summary):
+    print(f"{'nivel':10s} {'carreras':>9s} {'victorias':>9s} {'terminó':>8s} {'chocó':>7s} "
+          f"{'choque s (p10/med/p90)':>24s} {'puntaje (p10/med/p90/máx)':>28s}")
+    for level, s in summary.items():
+        c, p = s["choque_s"], s["puntaje"]
+        crash_txt = f"{c['p10']:.1f}/{c['mediana']:.1f}/{c['p90']:.1f}"
+        score_txt = f"{p['p10']}/{p['mediana']:g}/{p['p90']}/{p['max']}"
+        print(f"{level:10s} {s['carreras']:9d} {s['victorias']:9.1%} {s['terminadas']:8.1%} "
+              f"{s['choques']:7.1%} {crash_txt:>24s} {score_txt:>28s}")
+
+
+def positive_int(text):
+    """Entero >= 1 (el resumen divide por el número de carreras)."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1: {text}")
+    return value
+
+
+def parse_override(text):
+    """'clave=valor' -> (clave, número); el valor se lee como JSON."""
+    key, _, value = text.partition("=")
+    if key not in game.LEVEL_PRESETS["MEDIO"]:
+        raise argparse.ArgumentTypeError(f"parámetro de nivel desconocido: {key}")
+    return key, json.loads(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de carreras de NASCAR Pixel FX")
+    parser.add_argument("--carreras", type=positive_int, default=DEFAULT_RACES, help="carreras por nivel")
+    parser.add_argument("--niveles", nargs="*", default=list(game.LEVEL_PRESETS), choices=list(game.LEVEL_PRESETS))
+    parser.add_argument("--politica", default="esquivar", choices=list(POLICIES))
+    parser.add_argument("--procesos", type=int, default=None, help="procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--max-segundos", type=float, default=MAX_RACE_SECONDS)
+    parser.add_argument("--param", type=parse_override, action="append", default=[],
+                        help="reajusta un parámetro de nivel, p. ej. spawn_ms=900")
+    parser.add_argument("--json", help="guarda el resumen en este archivo")
+    args = parser.parse_args(argv)
+
+    overrides = dict(args.param) or None
+    start = time.perf_counter()
+    results = run_simulation(args.niveles, args.carreras, args.politica, args.procesos,
+                             args.semilla, overrides, args.max_segundos)
+    elapsed = time.perf_counter() - start
+
+    summary = {level: summarize(races) for level, races in results.items()}
+    print_summary(summary)
+    total = sum(len(r) for r in results.values())
+    print(f"{total} carreras en {elapsed:.1f} s ({total / elapsed:.0f} carreras/s)")
+
+    if args.json:
+        data = {"politica": args.politica, "semilla": args.semilla, "parametros": overrides, "niveles": summary}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())